@@ -0,0 +1,76 @@
+# Measures the CPU side of a login: password verification throughput and what a teacher session costs per request.
+# Run from the repository root: python -m benchmarks.login_throughput [--logins N]
+#
+# "inline" verifies on each client thread, as auth.login used to; "pooled" goes through
+# src.passwords.verify_password with its bounded pool and admission control, counting shed logins.
+# The users lookup is indexed and excluded here; only hashing and session encoding are timed.
+
+import argparse
+import os
+import time
+import bson
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+from werkzeug.security import generate_password_hash, check_password_hash
+from src import passwords
+from src.sessions import new_sid, now
+
+METHODS = ("scrypt", "pbkdf2:sha256:600000", "pbkdf2:sha256:100000")
+CONCURRENCY = (1, 8, 64)
+
+def run_logins(app, verify, password_hash, logins, concurrency):
+    shed = 0
+
+    def login(_):
+        nonlocal shed
+        # Each client is a request thread with its own app context
+        with app.app_context():
+            try:
+                verify(password_hash, "password")
+            except passwords.LoginBusy:
+                shed += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(login, range(logins)))
+    # Shed logins are fast rejections, so only completed verifications count towards the rate
+    return (logins - shed) / (time.perf_counter() - start), shed
+
+def cookie_session_size(app, data):
+    # Flask's default signed-cookie session, which carried the whole session before the server-side store
+    return len(app.session_interface.get_signing_serializer(app).dumps(data))
+
+def stored_session_size(data):
+    # The sessions document MongoSessionStore loads on each request; the cookie then only carries its _id
+    return len(bson.encode({"_id": new_sid(), "data": data, "expires_at": now()}))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.secret_key = "benchmark"
+    passwords.init_app(app)
+    print(f"cpus: {os.cpu_count()}, verification pool: {app.config['LOGIN_HASH_WORKERS']} workers, "
+          f"queue limit {app.config['LOGIN_QUEUE_LIMIT']}")
+
+    print(f"{'method':>22} {'clients':>8} {'inline/s':>10} {'pooled/s':>10} {'shed':>6}")
+    for method in METHODS:
+        password_hash = generate_password_hash("password", method=method)
+        for concurrency in CONCURRENCY:
+            inline, _ = run_logins(app, check_password_hash, password_hash, args.logins, concurrency)
+            pooled, shed = run_logins(app, passwords.verify_password, password_hash, args.logins, concurrency)
+            print(f"{method:>22} {concurrency:>8} {inline:>10.1f} {pooled:>10.1f} {shed:>6}")
+
+    # A teacher session used to carry every assigned class with its full roster
+    classes = [{"class_id": f"C{c}", "subject": "Subject", "students_enrolled": [f"student{c}{s:02}" for s in range(30)]}
+               for c in range(6)]
+    lean = {"username": "teacher1", "role": "Teacher", "name": "Teacher One"}
+    old = {**lean, "teacher_profile": {"teacher_id": "teacher1", "name": "Teacher One", "assigned_classes": classes}}
+    print(f"teacher session before: {cookie_session_size(app, old)} byte signed cookie")
+    print(f"teacher session after: {len(new_sid())} byte session id cookie, "
+          f"{stored_session_size(lean)} byte stored session document")
+
+if __name__ == '__main__':
+    main()
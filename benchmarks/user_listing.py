@@ -0,0 +1,39 @@
+# Measures the per-user cost of loading User records, as done by User.find_all for every listed document.
+# Run from the repository root: python -m benchmarks.user_listing
+
+import sys
+import time
+from werkzeug.security import generate_password_hash
+from src.models import User
+
+SIZES = (1000, 5000, 20000, 80000)
+
+def make_documents(count, password_hash):
+    return [
+        {"username": f"user{i}", "email": f"user{i}@school.edu", "password": password_hash,
+         "role": "Student", "name": f"User {i}"}
+        for i in range(count)
+    ]
+
+def time_listing(documents):
+    start = time.perf_counter()
+    for user in (User.from_dict(doc) for doc in documents):
+        pass
+    return time.perf_counter() - start
+
+def main():
+    password_hash = generate_password_hash("password")
+
+    # Loading one user used to re-hash the stored password; time a single derivation for comparison
+    start = time.perf_counter()
+    generate_password_hash(password_hash)
+    hash_cost = time.perf_counter() - start
+
+    print(f"{'users':>8} {'total ms':>10} {'us/user':>8} {'old estimate s':>15}")
+    for size in SIZES:
+        elapsed = time_listing(make_documents(size, password_hash))
+        print(f"{size:>8} {elapsed * 1000:>10.1f} {elapsed / size * 1e6:>8.2f} {hash_cost * size:>15.1f}")
+    print(f"slot size per User: {sys.getsizeof(User('u', 'e', password_hash='h', role='r'))} bytes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# Compares gunicorn worker models (sync, gthread, gevent) serving the app under concurrent clients.
+# Run from the repository root: python -m benchmarks.worker_models [--requests N] [--clients C]
+#
+# Each model is started with gunicorn.conf.py on the same number of worker processes. By default the
+# benchmark needs no database: /bench/io stands in for a typical read route, making --queries sequential
+# round trips of --latency ms (what a request spends waiting on Atlas) and returning JSON, and / renders
+# the home page. To measure real routes, point MONGO_URI at a test database and pass --paths plus a
+# logged-in --cookie, e.g. --paths /api/student_classes --cookie session=<sid>.
+
+import argparse
+import http.client
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODELS = ("sync", "gthread", "gevent")
+
+def bench_app():
+    """The app plus the simulated I/O route; gunicorn loads it as benchmarks.worker_models:bench_app()."""
+    from flask import jsonify
+    from src import create_app
+
+    app = create_app()
+    round_trips = int(os.getenv('BENCH_QUERIES', 3))
+    latency = float(os.getenv('BENCH_LATENCY_MS', 20)) / 1000
+
+    @app.route('/bench/io')
+    def bench_io():
+        # time.sleep is cooperative under gevent, as pymongo's socket reads are
+        for _ in range(round_trips):
+            time.sleep(latency)
+        return jsonify([{"class_id": f"C{c}", "subject": "Subject"} for c in range(20)])
+
+    return app
+
+def start_server(model, args):
+    env = dict(os.environ, WEB_WORKER_CLASS=model, WEB_CONCURRENCY=str(args.workers), PORT=str(args.port),
+               WEB_THREADS=str(args.threads), WEB_MAX_REQUESTS="0",
+               BENCH_QUERIES=str(args.queries), BENCH_LATENCY_MS=str(args.latency))
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017/SMS")
+    env.setdefault("MONGO_CREATE_INDEXES", "false")
+    env.setdefault("SESSION_STORE", "memory")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                               "benchmarks.worker_models:bench_app()"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", args.port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"gunicorn ({model}) did not start on port {args.port}")
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    server.wait(timeout=60)
+
+def run_clients(args, path):
+    latencies = []
+    errors = 0
+
+    def client(count):
+        nonlocal errors
+        # One keep-alive connection per client, like a browser tab
+        connection = http.client.HTTPConnection("127.0.0.1", args.port, timeout=30)
+        headers = {"Cookie": args.cookie} if args.cookie else {}
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+            latencies.append(time.perf_counter() - start)
+        connection.close()
+
+    per_client = max(1, args.requests // args.clients)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as clients:
+        list(clients.map(client, [per_client] * args.clients))
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100)
+    return len(latencies) / elapsed, quantiles[49] * 1000, quantiles[94] * 1000, quantiles[98] * 1000, errors
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", default=",".join(MODELS))
+    parser.add_argument("--paths", default="/bench/io,/")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=8, help="request threads per gthread worker")
+    parser.add_argument("--queries", type=int, default=3, help="round trips per /bench/io request")
+    parser.add_argument("--latency", type=float, default=20, help="ms per simulated round trip")
+    parser.add_argument("--cookie")
+    parser.add_argument("--port", type=int, default=18000)
+    args = parser.parse_args()
+
+    print(f"cpus: {os.cpu_count()}, workers: {args.workers}, clients: {args.clients}, "
+          f"/bench/io: {args.queries} x {args.latency:g} ms")
+    print(f"{'model':>8} {'path':>16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for model in args.models.split(","):
+        server = start_server(model, args)
+        try:
+            for path in args.paths.split(","):
+                # Warm up every worker before timing
+                run_clients(argparse.Namespace(**{**vars(args), "requests": args.clients}), path)
+                rate, p50, p95, p99, errors = run_clients(args, path)
+                print(f"{model:>8} {path:>16} {rate:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {errors:>7}")
+        finally:
+            stop_server(server)
+
+if __name__ == '__main__':
+    main()
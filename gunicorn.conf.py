@@ -0,0 +1,70 @@
+# Gunicorn settings for serving wsgi:app in production: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# WEB_WORKER_CLASS picks the worker model:
+#   sync     one request at a time per worker process; needs many workers to hide MongoDB latency
+#   gthread  WEB_THREADS request threads per worker (default); pymongo releases the GIL while waiting
+#   gevent   WEB_WORKER_CONNECTIONS greenlets per worker; best for routes that mostly wait on MongoDB
+# See README.md for the benchmark comparing them.
+#
+# Reload code gracefully with `kill -HUP <master pid>`: new workers start and old ones finish their
+# requests first. With preloading the master holds the old code, so deploy a new release with
+# `kill -USR2` followed by `kill -TERM` of the old master instead.
+
+import multiprocessing
+import os
+import tempfile
+
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+
+# gevent must patch the standard library before the app (and pymongo) is imported, which with
+# preload_app happens in the master before any worker starts
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.getenv('PORT', 10000)}"  # Render uses port 10000 by default
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Only for gthread: gunicorn turns sync workers into gthread ones when threads is above 1
+threads = int(os.getenv('WEB_THREADS', 8)) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', 200))
+
+# Import the app once in the master so workers share its memory and start quickly
+preload_app = os.getenv('WEB_PRELOAD', 'true').lower() == 'true'
+
+# Recycle each worker after this many requests (spread out by the jitter) to bound memory growth
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('WEB_KEEPALIVE', 5))
+
+# Application logs are JSON on stdout (src/logs.py); gunicorn's own error log goes to stderr
+accesslog = os.getenv('WEB_ACCESS_LOG')
+errorlog = '-'
+
+# Workers share metrics through files in this directory; it must be set before the app is imported
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'sms-prometheus'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+def on_starting(server):
+    # Files left by a previous master would be counted again; the preloaded app's own files are kept
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    for entry in os.listdir(directory):
+        if not entry.endswith(f"_{os.getpid()}.db"):
+            os.remove(os.path.join(directory, entry))
+
+def pre_fork(server, worker):
+    # Records the master has queued would otherwise be written by it and again by the new worker
+    from src import logs
+    logs.flush()
+
+def post_fork(server, worker):
+    # A preloaded app's MongoClient was created in the master; each worker needs its own
+    if server.cfg.preload_app:
+        from src import reconnect_mongo
+        reconnect_mongo(server.app.wsgi())
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
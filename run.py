@@ -1,4 +1,5 @@
 # Initializes and runs the Flask application so that the platform is accessible in website
+# (development server only; production serves wsgi:app with gunicorn, see README.md)
 
 import os
 from src import create_app
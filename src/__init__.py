@@ -1,3 +1,4 @@
+import logging
 import os
 from flask import Flask
 from flask_pymongo import PyMongo
@@ -6,31 +7,110 @@ from dotenv import load_dotenv
 # Initialize the MongoDB connection
 mongo = PyMongo()
 
+def connect_mongo(app):
+    # A command listener attributes each command to the request issuing it and a pool listener
+    # feeds the connection pool metrics
+    from . import querylog, metrics
+    mongo.init_app(app, event_listeners=[querylog.listener, metrics.pool_listener])
+
+def reconnect_mongo(app):
+    """Give a forked worker its own MongoClient.
+
+    A MongoClient is not fork-safe: its monitor threads do not survive fork and its pooled sockets
+    are shared with the parent. The inherited client is dropped without closing it, since closing
+    would end sessions over the parent's connections.
+    """
+    connect_mongo(app)
+
 def create_app():
     # Load environment variables
     load_dotenv()
 
     app = Flask(__name__)
 
+    # JSON logging through a background queue, with a correlation id per request
+    from . import logs
+    logs.init_app(app)
+
     # Configure the MongoDB URI (from environment variable for security)
     app.config['MONGO_URI'] = os.getenv('MONGO_URI')
     app.secret_key = os.getenv('SECRET_KEY', 'your_secret_key')  # Load SECRET_KEY from .env
 
     # Initialize MongoDB
-    mongo.init_app(app)
+    connect_mongo(app)
+    from . import querylog, metrics
+
+    # Create the indexes the routes rely on and register the index CLI commands
+    from . import indexes
+    indexes.init_app(app)
+
+    # Configure the per-worker roster and student name caches
+    from . import cache
+    cache.init_app(app)
+
+    # Register the date migration CLI command
+    from . import dates
+    dates.init_app(app)
+
+    # Select the attendance storage layout and register the bucket migration CLI command
+    from . import attendance
+    attendance.init_app(app)
+
+    # Register the rollup rebuild and consistency check CLI commands
+    from . import rollups
+    rollups.init_app(app)
+
+    # Register the user search backfill CLI command
+    from . import search
+    search.init_app(app)
+
+    # Configure password hashing and the login verification pool
+    from . import passwords
+    passwords.init_app(app)
+
+    # Keep session data server-side; the cookie only carries a session id
+    from . import sessions
+    sessions.init_app(app)
+
+    # Request counts, latency and size metrics at /metrics. Registered before compression so that its
+    # response hook runs after it and records the size actually sent.
+    metrics.init_app(app)
+
+    # Compress large responses. Response hooks run in reverse order of registration,
+    # so registering this one before the hooks that set headers or bodies makes it see the final body.
+    from . import compression
+    compression.init_app(app)
+
+    # Serve fingerprinted static files with long-lived caching and register the build-assets CLI command
+    from . import assets
+    assets.init_app(app)
+
+    # Per-request MongoDB command accounting, query budgets and repeated-query detection
+    querylog.init_app(app)
+
+    # On-demand request profiling (installs no hooks unless PROFILING_ENABLED is set)
+    from . import profiling
+    profiling.init_app(app)
+
+    # Register the bulk roster import CLI command
+    from . import roster_import
+    roster_import.init_app(app)
 
     # Load BASE_URL from environment (for Render hosting)
     app.config['BASE_URL'] = os.getenv('BASE_URL', 'http://localhost:5000')
 
-    print(f"MONGO_URI: {app.config.get('MONGO_URI')}")
-    print(f"Mongo initialized: {mongo}")
-    print(f"BASE_URL: {app.config.get('BASE_URL')}")
+    logging.getLogger(__name__).info("App configured", extra={
+        "mongo_uri": logs.redact_uri(app.config.get('MONGO_URI')), "base_url": app.config.get('BASE_URL')})
 
     # Import and register blueprints
     from .main import main as main_blueprint
     from .auth import auth as auth_blueprint
+    from .exports import exports as exports_blueprint
+    from .profiling import profiling as profiling_blueprint
 
     app.register_blueprint(main_blueprint)
     app.register_blueprint(auth_blueprint)
+    app.register_blueprint(exports_blueprint)
+    app.register_blueprint(profiling_blueprint)
 
     return app
\ No newline at end of file
@@ -0,0 +1,112 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import click
+from flask import request, url_for
+
+# Fingerprinted copies of src/static are written to static/dist by the build-assets command,
+# with a manifest mapping each original filename to its hashed copy and image variants.
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+
+# Hashed files never change content, so browsers may keep them for a year without revalidating
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Widths of the WebP variants generated for each PNG; images on the home page render at most 400px wide
+IMAGE_WIDTHS = (400, 800)
+
+_manifest = {"files": {}, "srcset": {}}
+
+def write_hashed(static_folder, filename, data):
+    """Write data to dist/ under filename with a content hash added, returning the new filename."""
+    root, ext = os.path.splitext(filename)
+    hashed = f"{DIST_DIR}/{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+    target = os.path.join(static_folder, hashed)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(data)
+    return hashed
+
+def image_variants(static_folder, filename):
+    """Write resized WebP copies of a PNG to dist/, returning [(hashed filename, width)]."""
+    try:
+        from PIL import Image
+    except ImportError:
+        # A build without variants would ship pages whose srcset silently falls back to the full-size PNG
+        raise click.ClickException("Pillow is required to build WebP variants; install requirements.txt")
+
+    variants = []
+    with Image.open(os.path.join(static_folder, filename)) as image:
+        root = os.path.splitext(filename)[0]
+        # Never upscale; the original width stands in for any larger requested width
+        for width in sorted({min(width, image.width) for width in IMAGE_WIDTHS}):
+            buffer = io.BytesIO()
+            image.resize((width, round(image.height * width / image.width)), Image.LANCZOS).save(buffer, "WEBP", quality=80)
+            variants.append((write_hashed(static_folder, f"{root}-{width}w.webp", buffer.getvalue()), width))
+    return variants
+
+def build(static_folder, echo=print):
+    """Fingerprint every static file and generate image variants, then write the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    manifest = {"files": {}, "srcset": {}}
+    for directory, _, files in os.walk(static_folder):
+        if os.path.commonpath([directory, dist]) == dist:
+            continue
+        for name in sorted(files):
+            filename = os.path.relpath(os.path.join(directory, name), static_folder).replace(os.sep, "/")
+            with open(os.path.join(static_folder, filename), "rb") as f:
+                manifest["files"][filename] = write_hashed(static_folder, filename, f.read())
+            if filename.startswith("images/") and filename.endswith(".png"):
+                variants = image_variants(static_folder, filename)
+                if variants:
+                    manifest["srcset"][filename] = variants
+            echo(f"{filename} -> {manifest['files'][filename]}")
+
+    os.makedirs(dist, exist_ok=True)
+    with open(os.path.join(dist, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST)
+    if not os.path.exists(path):
+        return {"files": {}, "srcset": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def srcset(filename):
+    """srcset attribute value listing the WebP variants of a static image, or "" before build-assets has run."""
+    return ", ".join(
+        f"{url_for('static', filename=variant)} {width}w" for variant, width in _manifest["srcset"].get(filename, [])
+    )
+
+def init_app(app):
+    global _manifest
+    _manifest = load_manifest(app.static_folder)
+
+    @app.url_defaults
+    def fingerprinted_static(endpoint, values):
+        # url_for('static', filename=...) points at the hashed copy once build-assets has run
+        if endpoint == 'static' and values.get('filename') in _manifest["files"]:
+            values['filename'] = _manifest["files"][values['filename']]
+
+    @app.after_request
+    def cache_fingerprinted(response):
+        if request.endpoint == 'static' and (request.view_args or {}).get('filename', '').startswith(DIST_DIR + "/"):
+            # send_file marks responses no-cache when no default max age is configured
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+    app.jinja_env.globals['srcset'] = srcset
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Fingerprint static files into static/dist and generate WebP image variants."""
+        build(app.static_folder, echo=click.echo)
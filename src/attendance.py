@@ -0,0 +1,213 @@
+import os
+import uuid
+import click
+from bson.objectid import ObjectId
+from flask import current_app
+from pymongo import UpdateOne
+from src import mongo, rollups
+from src.dates import parse_date, format_date, date_equals, date_since, date_between, ISO_FORMAT
+
+# Attendance storage layouts:
+#   flat     - one Attendance document per student, class and day (the original layout)
+#   dual     - writes go to both layouts and reads merge them, bucket values winning; used while migrating
+#   bucketed - one attendance_buckets document per class and day holding every student's status
+LAYOUTS = ("flat", "dual", "bucketed")
+BUCKETS = "attendance_buckets"
+
+def layout():
+    return current_app.config.get('ATTENDANCE_LAYOUT', 'flat')
+
+def bucket_id(class_id, day):
+    return f"{class_id}|{day.strftime(ISO_FORMAT)}"
+
+def bucket_update(class_id, day, statuses):
+    """Upsert for one class/day bucket replacing the records of the given students and keeping the rest."""
+    student_ids = list(statuses)
+    records = [{"student_id": student_id, "status": status} for student_id, status in statuses.items()]
+    return UpdateOne(
+        {"_id": bucket_id(class_id, day)},
+        [{"$set": {
+            "class_id": class_id,
+            "date": day,
+            "records": {"$concatArrays": [
+                {"$filter": {
+                    "input": {"$ifNull": ["$records", []]},
+                    "as": "record",
+                    "cond": {"$not": [{"$in": ["$$record.student_id", {"$literal": student_ids}]}]}
+                }},
+                {"$literal": records}
+            ]}
+        }}],
+        upsert=True
+    )
+
+def write_flat(class_id, day, statuses):
+    # Records being replaced: their statuses keep the rollup counters exact, and their stored dates
+    # (native or a legacy string) are matched exactly below
+    existing = {
+        record["student_id"]: record for record in mongo.db.Attendance.find(
+            {"class_id": class_id, "student_id": {"$in": list(statuses)}, "date": date_equals(day)},
+            {"student_id": 1, "status": 1, "date": 1, "_id": 0}
+        )
+    }
+    previous = {student_id: record.get("status") for student_id, record in existing.items()}
+
+    # One bulk upsert keyed on (student_id, class_id, date); re-submitting updates instead of duplicating.
+    # The filter is plain equality on the attendance_key fields, so when two submits race to insert the same
+    # record MongoDB retries the losing upsert as an update instead of failing with a duplicate key error.
+    operations = [
+        UpdateOne(
+            {"student_id": student_id, "class_id": class_id,
+             "date": existing[student_id]["date"] if student_id in existing else day},
+            {"$set": {"status": status}, "$setOnInsert": {"_id": str(uuid.uuid4())}},
+            upsert=True
+        )
+        for student_id, status in statuses.items()
+    ]
+    result = mongo.db.Attendance.bulk_write(operations, ordered=False)
+    return {"inserted": result.upserted_count, "updated": result.modified_count}, previous
+
+def write_bucket(class_id, day, statuses):
+    # Reads the bucket's current records first to report how many are new and to keep the rollups exact
+    existing = mongo.db[BUCKETS].find_one({"_id": bucket_id(class_id, day)}, {"records": 1, "_id": 0})
+    previous = {record["student_id"]: record.get("status") for record in (existing or {}).get("records", [])}
+    mongo.db[BUCKETS].bulk_write([bucket_update(class_id, day, statuses)])
+    inserted = len(set(statuses) - set(previous))
+    return {"inserted": inserted, "updated": len(statuses) - inserted}, previous
+
+def record_attendance(class_id, day, statuses):
+    """Store {student_id: status} for one class on one day in the configured layout."""
+    if not statuses:
+        return {"inserted": 0, "updated": 0}
+    mode = layout()
+    result = previous = None
+    if mode in ("flat", "dual"):
+        result, previous = write_flat(class_id, day, statuses)
+    if mode in ("dual", "bucketed"):
+        bucket_result, bucket_previous = write_bucket(class_id, day, statuses)
+        if result is None:
+            result, previous = bucket_result, bucket_previous
+    rollups.apply_attendance(class_id, previous, statuses)
+    return result
+
+def _flat_rows(class_id, student_ids, since):
+    query = {**date_since("date", since)}
+    if class_id is not None:
+        query["class_id"] = class_id
+    if student_ids is not None:
+        query["student_id"] = {"$in": list(student_ids)}
+    rows = []
+    for record in mongo.db.Attendance.find(query, {"student_id": 1, "class_id": 1, "date": 1, "status": 1, "_id": 0}):
+        # MM/DD/YYYY strings are returned by date_since for re-checking here
+        day = parse_date(record.get("date"))
+        if day is None or day >= since:
+            rows.append(record)
+    return rows
+
+def _bucket_rows(class_id, student_ids, since):
+    query = {"date": {"$gte": since}}
+    if class_id is not None:
+        query["class_id"] = class_id
+    if student_ids is not None:
+        query["records.student_id"] = {"$in": list(student_ids)}
+    wanted = set(student_ids) if student_ids is not None else None
+    rows = []
+    for bucket in mongo.db[BUCKETS].find(query, {"_id": 0}):
+        for record in bucket.get("records", []):
+            if wanted is None or record["student_id"] in wanted:
+                rows.append({"student_id": record["student_id"], "class_id": bucket["class_id"],
+                             "date": bucket["date"], "status": record["status"]})
+    return rows
+
+def find_attendance(since, class_id=None, student_ids=None):
+    """Return attendance rows (student_id, class_id, date as YYYY-MM-DD, status) on or after since.
+
+    Filters by class_id and/or student_ids, reading the configured layout. With neither filter
+    nothing is returned, rather than every class's attendance in the window.
+    """
+    if class_id is None and student_ids is None:
+        return []
+    mode = layout()
+    rows = _bucket_rows(class_id, student_ids, since) if mode in ("dual", "bucketed") else []
+    if mode in ("flat", "dual"):
+        # During the dual-read period flat rows only fill in days the buckets do not have yet
+        seen = {(row["student_id"], row["class_id"], row["date"]) for row in rows}
+        for row in _flat_rows(class_id, student_ids, since):
+            if (row["student_id"], row["class_id"], parse_date(row.get("date"))) not in seen:
+                rows.append(row)
+    for row in rows:
+        row["date"] = format_date(row.get("date"), ISO_FORMAT)
+    return rows
+
+def iter_attendance(start, end, class_ids=None, batch_size=1000):
+    """Yield attendance rows with start <= date < end straight from a cursor, for exports."""
+    if layout() == "bucketed":
+        query = {"date": {"$gte": start, "$lt": end}}
+        if class_ids is not None:
+            query["class_id"] = {"$in": list(class_ids)}
+        for bucket in mongo.db[BUCKETS].find(query, {"_id": 0}).batch_size(batch_size):
+            for record in bucket.get("records", []):
+                yield {"student_id": record["student_id"], "class_id": bucket["class_id"],
+                       "date": format_date(bucket["date"], ISO_FORMAT), "status": record["status"]}
+        return
+
+    # Flat documents are complete in both the flat and dual layouts
+    query = date_between("date", start, end)
+    if class_ids is not None:
+        query["class_id"] = {"$in": list(class_ids)}
+    projection = {"student_id": 1, "class_id": 1, "date": 1, "status": 1, "_id": 0}
+    for record in mongo.db.Attendance.find(query, projection).batch_size(batch_size):
+        day = parse_date(record.get("date"))
+        if day is not None and not (start <= day < end):
+            continue
+        record["date"] = format_date(record.get("date"), ISO_FORMAT)
+        yield record
+
+def migrate_to_buckets(batch_size=1000, start_after=None, echo=print):
+    """Copy flat Attendance documents into class/day buckets in _id order.
+
+    Flat documents are left in place for the dual-read period. Bucket writes replace a student's
+    record rather than appending, so the migration can be re-run or resumed with start_after.
+    """
+    copied = 0
+    skipped = 0
+    last_id = start_after
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        batch = list(mongo.db.Attendance.find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        buckets = {}
+        for record in batch:
+            day = parse_date(record.get("date"))
+            if day is None or not record.get("class_id") or not record.get("student_id"):
+                skipped += 1
+                continue
+            buckets.setdefault((record["class_id"], day), {})[record["student_id"]] = record.get("status")
+            copied += 1
+
+        if buckets:
+            mongo.db[BUCKETS].bulk_write(
+                [bucket_update(class_id, day, statuses) for (class_id, day), statuses in buckets.items()],
+                ordered=False
+            )
+        echo(f"Attendance: {copied} copied, {skipped} skipped, last _id {last_id}")
+    return {"copied": copied, "skipped": skipped}
+
+def init_app(app):
+    # Storage layout for attendance, set with ATTENDANCE_LAYOUT (flat, dual or bucketed)
+    app.config.setdefault('ATTENDANCE_LAYOUT', os.getenv('ATTENDANCE_LAYOUT', 'flat'))
+    if app.config['ATTENDANCE_LAYOUT'] not in LAYOUTS:
+        raise ValueError(f"ATTENDANCE_LAYOUT must be one of {', '.join(LAYOUTS)}")
+
+    @app.cli.command('migrate-attendance-buckets')
+    @click.option('--batch-size', default=1000, show_default=True, help="Attendance documents read per batch.")
+    @click.option('--start-after', default=None, help="Resume after this Attendance _id.")
+    def migrate_attendance_buckets_command(batch_size, start_after):
+        """Copy flat Attendance documents into per-class, per-day buckets."""
+        # The logged last _id is printed as a string; ObjectIds sort after strings, so it must be converted back
+        if start_after is not None and ObjectId.is_valid(start_after):
+            start_after = ObjectId(start_after)
+        migrate_to_buckets(batch_size=batch_size, start_after=start_after, echo=click.echo)
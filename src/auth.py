@@ -1,8 +1,10 @@
+import logging
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session, current_app
-from werkzeug.security import check_password_hash
 from src import mongo
+from src.passwords import verify_password, needs_rehash, rehash_password, LoginBusy
 
 auth = Blueprint('auth', __name__)
+logger = logging.getLogger(__name__)
 
 @auth.route('/')
 def home():
@@ -26,15 +28,43 @@ def login():
     }
     active_tab = role_to_tab.get(role, "home")
 
-    # Query the user from the MongoDB users collection
-    user = mongo.db.users.find_one({"username": username})
+    # Query the user from the MongoDB users collection (indexed on username)
+    user = mongo.db.users.find_one(
+        {"username": username},
+        {"username": 1, "password": 1, "role": 1, "name": 1, "_id": 0}
+    )
 
-    if user and check_password_hash(user['password'], password):
+    # Hashes are verified on a bounded pool; when it is full the login is shed instead of queueing behind it
+    try:
+        valid = bool(user) and verify_password(user.get('password'), password)
+    except LoginBusy:
+        logger.warning("Login shed, password verification is saturated")
+        flash("Too many sign-ins right now. Please try again in a moment.", category="error")
+        return render_template('home.html', active_tab=active_tab), 503, {"Retry-After": "1"}
+
+    if valid:
         if user['role'] == role:
+            # Upgrade hashes made with old parameters while the plain-text password is at hand. The new hash is
+            # made on the verification pool; when that is saturated the upgrade waits for a later login.
+            if needs_rehash(user['password']):
+                try:
+                    mongo.db.users.update_one(
+                        {"username": user['username'], "password": user['password']},
+                        {"$set": {"password": rehash_password(password)}}
+                    )
+                except LoginBusy:
+                    logger.info("Password upgrade deferred, password hashing is saturated", extra={"username": user['username']})
+
+            # The session only holds identifiers; profiles and rosters are read (and cached) by the pages that use them.
+            # A new session id is issued at login so one set before authentication cannot be reused.
+            session.regenerate()
+            # Permanent, so the cookie carries the same sliding expiry as the stored session instead of
+            # ending when the browser closes
+            session.permanent = True
             session['username'] = user['username']
             session['role'] = user['role']
             session['name'] = user.get('name', role.capitalize())
-            print(f"[DEBUG] Login successful - Username: {user['username']}, Role: {user['role']}") # Debugging output for error checking
+            logger.info("Login succeeded", extra={"username": user['username'], "role": user['role']})
 
             # Redirect to appropriate dashboard depending on user role
             if role == 'Student':
@@ -42,22 +72,16 @@ def login():
             elif role == 'Parent':
                 return redirect(url_for('main.parent_dashboard'))
             elif role == 'Teacher':
-                teacher_profile = mongo.db["Teacher Profile"].find_one({"teacher_id": username})
-                session['teacher_profile'] = {
-                    "teacher_id": teacher_profile["teacher_id"],
-                    "name": teacher_profile["name"],
-                    "assigned_classes": teacher_profile["assigned_classes"]
-                }
                 return redirect(url_for('main.teacher_dashboard'))
             elif role == 'Administrator':
                 return redirect(url_for('main.admin_dashboard'))
             else:
                 flash("Incorrect credentials. Please try again.", category="error") # Error message on tab if credentials do not match role, or username/password do not match
         else:
-            print(f"[DEBUG] Role mismatch - Username: {username}")
+            logger.info("Login failed", extra={"username": username, "reason": "role mismatch"})
             flash("Incorrect credentials. Please try again.", category="error")
     else:
-        print(f"[DEBUG] Invalid login - Username: {username}")
+        logger.info("Login failed", extra={"username": username, "reason": "invalid credentials"})
         flash("Incorrect credentials. Please try again.", category="error")
 
     # Redirect back to the home page with the current tab active so the error message shows only there
@@ -67,6 +91,6 @@ def login():
 @auth.route('/logout')
 def logout():
     """Logout route for all users."""
-    print(f"[DEBUG] Logging out - Username: {session.get('username', 'Unknown')}")
+    logger.info("Logout", extra={"username": session.get('username')})
     session.clear()
     return redirect(url_for('auth.home'))
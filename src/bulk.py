@@ -0,0 +1,44 @@
+from itertools import islice
+from pymongo.errors import BulkWriteError
+
+# MongoDB error code raised when a write violates a unique index
+DUPLICATE_KEY_ERROR = 11000
+
+# Upper bound on documents sent to MongoDB in a single insert_many call
+DEFAULT_CHUNK_SIZE = 500
+
+def chunked(iterable, size):
+    """Yield lists of at most size items from iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def insert_many_chunked(collection, documents, chunk_size=DEFAULT_CHUNK_SIZE, on_inserted=None):
+    """Insert documents with unordered insert_many calls in bounded chunks.
+
+    Rows rejected by a unique index are counted as duplicates instead of failing the
+    whole write, so re-running the same fan-out is safe. Any other write error is raised.
+    on_inserted, if given, is called with the list of documents actually inserted from each chunk.
+    """
+    inserted = 0
+    duplicates = 0
+    for chunk in chunked(documents, chunk_size):
+        try:
+            result = collection.insert_many(chunk, ordered=False)
+            inserted += len(result.inserted_ids)
+            if on_inserted:
+                on_inserted(chunk)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            duplicate_errors = [err for err in write_errors if err.get("code") == DUPLICATE_KEY_ERROR]
+            if len(duplicate_errors) != len(write_errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+            duplicates += len(duplicate_errors)
+            if on_inserted:
+                rejected = {err["index"] for err in write_errors}
+                on_inserted([doc for index, doc in enumerate(chunk) if index not in rejected])
+    return {"inserted": inserted, "duplicates": duplicates}
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from src import mongo
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire ttl seconds after being stored.
+
+    Each worker process has its own instances, so writes made by this app must call
+    invalidate() and entries changed elsewhere are at most ttl seconds stale.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses}
+
+# teacher_id -> assigned_classes (class_id, subject and students_enrolled only). Short-lived because
+# enrollment changed in another worker is only seen here once the entry expires.
+rosters = TTLCache(ttl=60)
+# student_id -> "First Last"
+student_names = TTLCache(maxsize=20000)
+
+def get_teacher_classes(teacher_id):
+    """Return the teacher's assigned_classes, or None if there is no Teacher Profile."""
+    classes = rosters.get(teacher_id)
+    if classes is None:
+        profile = mongo.db["Teacher Profile"].find_one(
+            {"teacher_id": teacher_id},
+            {"assigned_classes.class_id": 1, "assigned_classes.subject": 1,
+             "assigned_classes.students_enrolled": 1, "_id": 0}
+        )
+        if not profile:
+            return None
+        classes = profile.get("assigned_classes", [])
+        rosters.set(teacher_id, classes)
+    return classes
+
+def get_student_names(student_ids):
+    """Return {student_id: "First Last"} for the given ids that have a Student Profile."""
+    names = {}
+    missing = []
+    for student_id in student_ids:
+        name = student_names.get(student_id)
+        if name is None:
+            missing.append(student_id)
+        else:
+            names[student_id] = name
+
+    # One $in query for every id not already cached
+    if missing:
+        for s in mongo.db["Student Profile"].find(
+            {"student_id": {"$in": missing}},
+            {"student_id": 1, "first_name": 1, "last_name": 1, "_id": 0}
+        ):
+            name = f"{s.get('first_name', '')} {s.get('last_name', '')}".strip()
+            student_names.set(s["student_id"], name)
+            names[s["student_id"]] = name
+    return names
+
+def student_list(student_ids):
+    """Return [{"id", "name"}] in roster order for students with a profile, without duplicates."""
+    student_ids = list(dict.fromkeys(student_ids))
+    names = get_student_names(student_ids)
+    return [{"id": student_id, "name": names[student_id]} for student_id in student_ids if student_id in names]
+
+# Invalidation hooks for write paths that change enrollment or names
+def invalidate_teacher(teacher_id):
+    rosters.invalidate(teacher_id)
+
+def invalidate_student(student_id):
+    student_names.invalidate(student_id)
+
+def stats():
+    return {"rosters": rosters.stats(), "student_names": student_names.stats()}
+
+def init_app(app):
+    # Cache sizes and lifetimes, overridable through the environment
+    app.config.setdefault('ROSTER_CACHE_TTL', int(os.getenv('ROSTER_CACHE_TTL', 60)))
+    app.config.setdefault('ROSTER_CACHE_SIZE', int(os.getenv('ROSTER_CACHE_SIZE', 1024)))
+    app.config.setdefault('STUDENT_NAME_CACHE_TTL', int(os.getenv('STUDENT_NAME_CACHE_TTL', 300)))
+    app.config.setdefault('STUDENT_NAME_CACHE_SIZE', int(os.getenv('STUDENT_NAME_CACHE_SIZE', 20000)))
+    rosters.ttl = app.config['ROSTER_CACHE_TTL']
+    rosters.maxsize = app.config['ROSTER_CACHE_SIZE']
+    student_names.ttl = app.config['STUDENT_NAME_CACHE_TTL']
+    student_names.maxsize = app.config['STUDENT_NAME_CACHE_SIZE']
@@ -0,0 +1,51 @@
+import gzip
+import os
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it responses are only gzip-compressed
+    brotli = None
+
+# Body types worth compressing; images are already compressed
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+def compress(data, encoding, level):
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level)
+
+def choose_encoding(accept_encoding):
+    # Prefer brotli when the client and server both support it
+    if brotli is not None and accept_encoding["br"]:
+        return "br"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return None
+
+def init_app(app):
+    # Smallest body compressed (bytes) and compression levels; very small bodies are not worth the CPU
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.getenv('COMPRESS_MIN_SIZE', 1024)))
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', int(os.getenv('COMPRESS_GZIP_LEVEL', 6)))
+    app.config.setdefault('COMPRESS_BROTLI_LEVEL', int(os.getenv('COMPRESS_BROTLI_LEVEL', 5)))
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add("Accept-Encoding")
+        # Streamed responses (exports) and files sent straight from disk are left alone
+        if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+                or "Content-Encoding" in response.headers
+                or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)):
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None or (response.content_length or 0) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        level = app.config['COMPRESS_BROTLI_LEVEL' if encoding == "br" else 'COMPRESS_GZIP_LEVEL']
+        response.set_data(compress(response.get_data(), encoding, level))
+        response.headers["Content-Encoding"] = encoding
+        # The compressed body differs byte for byte, so a strong ETag from the plain body becomes weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,37 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+# Shared pool for running independent MongoDB queries of one request at the same time.
+# pymongo releases the GIL while waiting on the network, so threads overlap the round trips.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('QUERY_POOL_SIZE', 16)),
+    thread_name_prefix='query'
+)
+
+def run_concurrently(*calls):
+    """Run zero-argument callables on the shared pool and return their results in order.
+
+    Each call runs inside the current app context. Exceptions are re-raised in the caller.
+    """
+    if len(calls) < 2:
+        return [call() for call in calls]
+
+    app = current_app._get_current_object()
+
+    def in_app_context(call):
+        with app.app_context():
+            return call()
+
+    # Each call runs in a copy of the caller's context, so per-request state such as the query log follows it
+    futures = [_executor.submit(contextvars.copy_context().run, in_app_context, call) for call in calls]
+    return [future.result() for future in futures]
+
+def gevent_patched():
+    """True when gevent has monkey-patched threading, so "threads" are greenlets sharing one OS thread."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
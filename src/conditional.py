@@ -0,0 +1,30 @@
+from functools import wraps
+from flask import make_response, request
+
+def conditional(max_age=0):
+    """Make a read-only JSON route answer conditional GETs.
+
+    Successful responses get an ETag (a hash of the body) and Cache-Control. A request whose
+    If-None-Match still matches gets an empty 304, so the browser reuses its copy instead of downloading
+    and re-rendering it. Only ETags are supported: the profile collections carry no modification times,
+    so no Last-Modified is set and If-Modified-Since alone never produces a 304.
+    With max_age 0 the browser revalidates on every use; otherwise it may reuse its copy for max_age seconds.
+    Responses depend on the logged-in user, so they are private and vary on the session cookie.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if request.method not in ("GET", "HEAD") or response.status_code != 200:
+                return response
+
+            response.cache_control.private = True
+            if max_age:
+                response.cache_control.max_age = max_age
+            else:
+                response.cache_control.no_cache = True
+            response.vary.add("Cookie")
+            response.add_etag()
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
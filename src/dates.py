@@ -0,0 +1,125 @@
+from datetime import datetime
+import click
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from src import mongo
+from src.bulk import DUPLICATE_KEY_ERROR
+
+# Formats dates were stored in as strings before they were migrated to native BSON dates.
+# The app displays assignment dates as MM/DD/YYYY and attendance dates as YYYY-MM-DD.
+DISPLAY_FORMAT = "%m/%d/%Y"
+ISO_FORMAT = "%Y-%m-%d"
+LEGACY_FORMATS = (DISPLAY_FORMAT, ISO_FORMAT)
+
+# Matches MM/DD/YYYY strings, which do not sort chronologically and must be filtered in Python
+DISPLAY_FORMAT_PATTERN = r"^\d{2}/\d{2}/\d{4}$"
+
+# Date fields converted by the migrate-dates command, per collection
+DATE_FIELDS = {
+    "assignments_grades": ["assigned_date", "due_date", "graded_date"],
+    "Attendance": ["date"],
+}
+
+def parse_date(value):
+    """Return a datetime for a stored date (native or legacy string), or None if it cannot be read."""
+    if isinstance(value, datetime):
+        return value
+    if not value or not isinstance(value, str):
+        return None
+    for fmt in LEGACY_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+def format_date(value, fmt=DISPLAY_FORMAT):
+    """Format a stored date for display, passing through values that cannot be parsed."""
+    dt = parse_date(value)
+    if dt is None:
+        return value or ""
+    return dt.strftime(fmt)
+
+def today():
+    # Current date as a midnight datetime, the precision dates are stored at
+    return datetime.combine(datetime.now().date(), datetime.min.time())
+
+def date_equals(value):
+    """Query condition matching a date stored natively or in either legacy string format."""
+    dt = parse_date(value)
+    if dt is None:
+        return value
+    return {"$in": [dt] + [dt.strftime(fmt) for fmt in LEGACY_FORMATS]}
+
+def date_since(field, since):
+    """Query filter for field >= since that tolerates unmigrated rows.
+
+    Native dates and YYYY-MM-DD strings are compared by MongoDB. MM/DD/YYYY strings cannot be
+    range-compared, so they are returned as well and callers re-check them with parse_date.
+    Once migrate-dates has run only the first branch matches anything.
+    """
+    return {"$or": [
+        {field: {"$gte": since}},
+        {field: {"$gte": since.strftime(ISO_FORMAT)}},
+        {field: {"$regex": DISPLAY_FORMAT_PATTERN}},
+    ]}
+
+def date_between(field, start, end):
+    """Query filter for start <= field < end, tolerating unmigrated rows the same way as date_since."""
+    return {"$or": [
+        {field: {"$gte": start, "$lt": end}},
+        {field: {"$gte": start.strftime(ISO_FORMAT), "$lt": end.strftime(ISO_FORMAT)}},
+        {field: {"$regex": DISPLAY_FORMAT_PATTERN}},
+    ]}
+
+def migrate_field(collection, field, batch_size=1000, echo=print):
+    """Rewrite string values of field as native datetimes, batch_size documents at a time.
+
+    Only string values are selected, so the migration can be stopped and re-run at any time.
+    Empty strings become None; strings that cannot be parsed are left untouched and counted as skipped.
+    """
+    converted = 0
+    skipped = 0
+    last_id = None
+    while True:
+        query = {field: {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query, {field: 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        ops = []
+        for doc in batch:
+            raw = doc[field]
+            dt = parse_date(raw)
+            if dt is None and raw.strip():
+                skipped += 1
+                continue
+            # Filter on the old value so a concurrent write is never overwritten
+            ops.append(UpdateOne({"_id": doc["_id"], field: raw}, {"$set": {field: dt}}))
+
+        if ops:
+            try:
+                converted += collection.bulk_write(ops, ordered=False).modified_count
+            except BulkWriteError as e:
+                # Rows whose converted value collides with an existing row on a unique index are left as strings;
+                # any other write error is raised
+                write_errors = e.details.get("writeErrors", [])
+                duplicate_errors = [err for err in write_errors if err.get("code") == DUPLICATE_KEY_ERROR]
+                if len(duplicate_errors) != len(write_errors):
+                    raise
+                converted += e.details.get("nModified", 0)
+                skipped += len(duplicate_errors)
+        echo(f"{collection.name}.{field}: {converted} converted, {skipped} skipped")
+    return {"converted": converted, "skipped": skipped}
+
+def init_app(app):
+    @app.cli.command('migrate-dates')
+    @click.option('--batch-size', default=1000, show_default=True, help="Documents updated per bulk write.")
+    def migrate_dates_command(batch_size):
+        """Convert string dates in assignments_grades and Attendance to native dates."""
+        for collection_name, fields in DATE_FIELDS.items():
+            for field in fields:
+                migrate_field(mongo.db[collection_name], field, batch_size=batch_size, echo=click.echo)
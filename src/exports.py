@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import timedelta
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context
+from src import mongo
+from src.attendance import iter_attendance
+from src.cache import get_teacher_classes
+from src.dates import parse_date, format_date, today
+from src.main import audit_log_query
+
+exports = Blueprint('exports', __name__)
+
+# Rows read from MongoDB per cursor batch and encoded per response chunk, bounding memory per export
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+GRADE_FIELDS = ["student_id", "class_number", "assignment_name", "assigned_date", "due_date", "grade", "graded_date"]
+ATTENDANCE_FIELDS = ["student_id", "class_id", "date", "status"]
+AUDIT_LOG_FIELDS = ["_id", "admin_user", "users_name", "username", "email", "user_role",
+                    "updated_item", "previous_value", "date_time"]
+
+def encode_rows(rows, fields, fmt):
+    """Yield rows encoded as CSV or NDJSON, EXPORT_BATCH_SIZE rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    if fmt == "csv":
+        writer.writeheader()
+    count = 0
+    for row in rows:
+        if fmt == "csv":
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps({field: row.get(field) for field in fields}, default=str) + "\n")
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def gzip_chunks(chunks):
+    # Streams a gzip file without holding the whole body; wbits=31 writes the gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(name, rows, fields):
+    """Stream rows as a file download in the requested format (?format=csv|ndjson, ?gzip=1)."""
+    fmt = request.args.get("format", "csv")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+
+    filename = f"{name}.{fmt}"
+    mimetype = FORMATS[fmt]
+    chunks = encode_rows(rows, fields, fmt)
+    if request.args.get("gzip") == "1":
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        mimetype = "application/gzip"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Classes the logged-in user may export: a teacher gets their own, an administrator everything (None).
+# Returns an error response tuple instead when access is not allowed.
+def export_class_ids():
+    role = session.get('role')
+    class_id = request.args.get('class_id')
+    if role == 'Administrator':
+        teacher_id = request.args.get('teacher_id')
+        if teacher_id:
+            class_ids = [cls["class_id"] for cls in get_teacher_classes(teacher_id) or []]
+            return [c for c in class_ids if c == class_id] if class_id else class_ids
+        return [class_id] if class_id else None
+    if role == 'Teacher':
+        class_ids = [cls["class_id"] for cls in get_teacher_classes(session.get('username')) or []]
+        if class_id:
+            if class_id not in class_ids:
+                return jsonify({"error": "Class not found"}), 404
+            return [class_id]
+        return class_ids
+    return jsonify({"error": "Access denied"}), 403
+
+@exports.route('/export/grades', methods=['GET'])
+def export_grades():
+    class_ids = export_class_ids()
+    if isinstance(class_ids, tuple):
+        return class_ids
+
+    query = {"class_number": {"$in": class_ids}} if class_ids is not None else {}
+    projection = {**{field: 1 for field in GRADE_FIELDS}, "_id": 0}
+    cursor = mongo.db["assignments_grades"].find(query, projection).batch_size(EXPORT_BATCH_SIZE)
+
+    def rows():
+        for grade in cursor:
+            for field in ("assigned_date", "due_date", "graded_date"):
+                grade[field] = format_date(grade.get(field))
+            yield grade
+
+    return export_response("grades", rows(), GRADE_FIELDS)
+
+@exports.route('/export/attendance', methods=['GET'])
+def export_attendance():
+    class_ids = export_class_ids()
+    if isinstance(class_ids, tuple):
+        return class_ids
+
+    # Date range is inclusive; defaults to the last 30 days
+    start = parse_date(request.args.get("start_date")) or today() - timedelta(days=30)
+    end = (parse_date(request.args.get("end_date")) or today()) + timedelta(days=1)
+
+    rows = iter_attendance(start, end, class_ids=class_ids, batch_size=EXPORT_BATCH_SIZE)
+    return export_response("attendance", rows, ATTENDANCE_FIELDS)
+
+@exports.route('/export/audit_log', methods=['GET'])
+def export_audit_log():
+    if session.get('role') != 'Administrator':
+        return jsonify({"error": "Access denied"}), 403
+
+    # Same filters as the audit log page, oldest first
+    query = audit_log_query(request.args)
+    cursor = mongo.db.audit_log.find(query).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+    return export_response("audit_log", cursor, AUDIT_LOG_FIELDS)
@@ -0,0 +1,165 @@
+import logging
+import os
+import click
+import pymongo
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
+from src import mongo
+
+logger = logging.getLogger(__name__)
+
+# Indexes required by the queries in main.py and auth.py, grouped by collection.
+# Names are fixed so create_indexes is idempotent and the report can match them up.
+INDEXES = {
+    "users": [
+        # auth.login, update_user
+        IndexModel([("username", ASCENDING)], name="username", unique=True),
+        IndexModel([("email", ASCENDING)], name="email"),
+        # manage_users_permissions and /api/users/search prefix matches, plus the fuzzy fallback
+        IndexModel([("username_lower", ASCENDING)], name="username_lower"),
+        IndexModel([("email_lower", ASCENDING)], name="email_lower"),
+        IndexModel([("username", TEXT), ("email", TEXT), ("name", TEXT)], name="user_search_text"),
+    ],
+    "Student Profile": [
+        # Every student lookup and the $in name lookups for rosters
+        IndexModel([("student_id", ASCENDING)], name="student_id", unique=True),
+    ],
+    "Teacher Profile": [
+        # auth.login, grades_get_students, get_students, profile_get_students, assign_homework
+        IndexModel([("teacher_id", ASCENDING)], name="teacher_id", unique=True),
+        # api_student_class_schedule, api_parent_class_schedule
+        IndexModel([("assigned_classes.students_enrolled", ASCENDING)], name="students_enrolled"),
+    ],
+    "Parent Profile": [
+        # api_parent_students, api_parent_students_bus, api_parent_students_gradeassignments
+        IndexModel([("parent_id", ASCENDING)], name="parent_id", unique=True),
+    ],
+    "assignments_grades": [
+        # Uniqueness key for assign_homework; its prefixes serve the student_id and
+        # student_id + class_number lookups in get_student_grades and api_student_assignments_homework
+        IndexModel(
+            [("student_id", ASCENDING), ("class_number", ASCENDING),
+             ("assignment_name", ASCENDING), ("assigned_date", ASCENDING)],
+            name="assignment_key", unique=True
+        ),
+        # Grade exports by class
+        IndexModel([("class_number", ASCENDING)], name="class_number"),
+        # api_parent_grades window on assigned_date
+        IndexModel([("student_id", ASCENDING), ("assigned_date", ASCENDING)], name="student_assigned_date"),
+    ],
+    "Attendance": [
+        # teacher_attendance filters by class, optionally student, and a date window
+        IndexModel([("class_id", ASCENDING), ("student_id", ASCENDING), ("date", ASCENDING)], name="class_student_date"),
+        # Roll-call upsert key; one record per student, class and day
+        IndexModel([("student_id", ASCENDING), ("class_id", ASCENDING), ("date", ASCENDING)], name="attendance_key", unique=True),
+        # Attendance exports by date range across all classes
+        IndexModel([("date", ASCENDING)], name="date"),
+        # api_attendance_records filters by student and a date window
+        IndexModel([("student_id", ASCENDING), ("date", ASCENDING)], name="student_date"),
+    ],
+    "attendance_buckets": [
+        # Bucketed attendance layout: teacher_attendance by class, api_attendance_records by student
+        IndexModel([("class_id", ASCENDING), ("date", ASCENDING)], name="class_date"),
+        IndexModel([("records.student_id", ASCENDING), ("date", ASCENDING)], name="student_date"),
+    ],
+    "audit_log": [
+        # audit_log filters, each paged newest first by _id
+        IndexModel([("admin_user", ASCENDING), ("_id", DESCENDING)], name="admin_user_id"),
+        IndexModel([("username", ASCENDING), ("_id", DESCENDING)], name="username_id"),
+        IndexModel([("updated_item", ASCENDING), ("_id", DESCENDING)], name="updated_item_id"),
+    ],
+    "Bus Routes": [
+        # get_student_profile
+        IndexModel([("students", ASCENDING)], name="students"),
+    ],
+    "sessions": [
+        # Server-side sessions; MongoDB removes documents once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="session_expiry", expireAfterSeconds=0),
+    ],
+}
+
+def ping(db=None, timeout=None):
+    """Check that MongoDB is reachable, raising ServerSelectionTimeoutError after timeout seconds if it is not."""
+    db = db if db is not None else mongo.db
+    with pymongo.timeout(timeout):
+        db.command("ping")
+
+def create_indexes(db=None):
+    """Create every declared index, returning {collection: [index names]}.
+
+    Indexes that fail to build (e.g. duplicates blocking a unique index) are logged and skipped.
+    Losing the server stops the run instead of waiting out server selection once per index.
+    """
+    db = db if db is not None else mongo.db
+    results = {}
+    for collection_name, models in INDEXES.items():
+        created = []
+        # Indexes are created one at a time so a failure does not stop the rest
+        for model in models:
+            try:
+                created.extend(db[collection_name].create_indexes([model]))
+            except ServerSelectionTimeoutError:
+                raise
+            except PyMongoError as e:
+                logger.warning("Index creation failed", extra={
+                    "collection": collection_name, "index": model.document["name"], "error": str(e)})
+        results[collection_name] = created
+    return results
+
+def index_report(db=None):
+    """Compare declared indexes with the database.
+
+    Returns {collection: {"missing": [...], "undeclared": [...], "unused": [...]}} where
+    unused lists indexes with zero recorded operations since the server last started.
+    """
+    db = db if db is not None else mongo.db
+    report = {}
+    for collection_name, models in INDEXES.items():
+        declared = {model.document["name"] for model in models}
+        existing = set(db[collection_name].index_information()) - {"_id_"}
+        try:
+            stats = db[collection_name].aggregate([{"$indexStats": {}}])
+            unused = sorted(s["name"] for s in stats if s["name"] != "_id_" and s["accesses"]["ops"] == 0)
+        except PyMongoError:
+            # $indexStats needs the clusterMonitor role on some hosted tiers
+            unused = []
+        report[collection_name] = {
+            "missing": sorted(declared - existing),
+            "undeclared": sorted(existing - declared),
+            "unused": unused,
+        }
+    return report
+
+def init_app(app):
+    # Builds indexes at startup unless MONGO_CREATE_INDEXES is set to false. MONGO_STARTUP_TIMEOUT bounds
+    # the connectivity check (seconds), so an unreachable database delays startup by that much at most.
+    app.config.setdefault('MONGO_CREATE_INDEXES', os.getenv('MONGO_CREATE_INDEXES', 'true').lower() == 'true')
+    app.config.setdefault('MONGO_STARTUP_TIMEOUT', float(os.getenv('MONGO_STARTUP_TIMEOUT', 5)))
+    if app.config['MONGO_CREATE_INDEXES']:
+        with app.app_context():
+            try:
+                ping(timeout=app.config['MONGO_STARTUP_TIMEOUT'])
+                results = create_indexes()
+            except PyMongoError as e:
+                logger.error("Index creation skipped, MongoDB unavailable", extra={"error": str(e)})
+            else:
+                for collection_name, names in results.items():
+                    logger.info("Indexes ensured", extra={"collection": collection_name, "indexes": names})
+
+    @app.cli.command('create-indexes')
+    def create_indexes_command():
+        """Create the indexes declared in src/indexes.py."""
+        try:
+            ping(timeout=app.config['MONGO_STARTUP_TIMEOUT'])
+        except PyMongoError as e:
+            raise click.ClickException(f"MongoDB unavailable: {e}")
+        for collection_name, names in create_indexes().items():
+            click.echo(f"{collection_name}: {', '.join(names)}")
+
+    @app.cli.command('index-report')
+    def index_report_command():
+        """Report missing, undeclared and unused indexes."""
+        for collection_name, entry in index_report().items():
+            click.echo(collection_name)
+            for key in ("missing", "undeclared", "unused"):
+                click.echo(f"  {key}: {', '.join(entry[key]) or '-'}")
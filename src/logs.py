@@ -0,0 +1,162 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from flask import g, request
+
+# Correlation id of the request being handled; run_concurrently copies it into its worker threads
+request_id = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from extra= and is logged as a field
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request_id and any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in STANDARD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RequestIdFilter(logging.Filter):
+    # Handler filters run in the thread that logged, before the record is queued, so the id is the caller's
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+class DebugRateLimit(logging.Filter):
+    """Let through at most limit DEBUG records per message template per second.
+
+    Hot paths can log at DEBUG freely; under load only a sample reaches the output, and the next
+    record let through reports how many were suppressed. Other levels are never limited.
+    """
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or not self.limit:
+            return True
+        key = (record.name, record.msg)
+        second = int(time.monotonic())
+        with self.lock:
+            window, count, suppressed = self.windows.get(key, (second, 0, 0))
+            if window != second:
+                window, count = second, 0
+            if count >= self.limit:
+                self.windows[key] = (window, count, suppressed + 1)
+                return False
+            self.windows[key] = (window, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # Never blocks the caller: when the queue is full the record is dropped and counted
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+_listener = None
+_handler = None
+
+def redact_uri(uri):
+    # Keeps the scheme and hosts of a connection string, dropping credentials
+    if not uri or "@" not in uri:
+        return uri
+    scheme, _, rest = uri.partition("://")
+    return f"{scheme}://***@{rest.rpartition('@')[2]}"
+
+def configure(level="INFO", levels="", queue_size=10000, debug_rate=10):
+    """Route all logging through a bounded queue to a JSON stdout handler on a background thread.
+
+    levels sets per-logger levels, e.g. "src.auth=DEBUG,pymongo=WARNING".
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _handler.addFilter(RequestIdFilter())
+    _handler.addFilter(DebugRateLimit(debug_rate))
+
+    root = logging.getLogger()
+    root.handlers[:] = [_handler]
+    root.setLevel(level.upper())
+    for entry in filter(None, (item.strip() for item in levels.split(","))):
+        name, _, name_level = entry.partition("=")
+        logging.getLogger(name.strip()).setLevel(name_level.strip().upper())
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(lambda: _listener.stop())
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+def flush():
+    """Write out every queued record on the calling thread; the pre-fork server calls this before forking."""
+    while _listener is not None:
+        try:
+            record = _handler.queue.get_nowait()
+        except queue.Empty:
+            return
+        _listener.handle(record)
+
+def _restart_after_fork():
+    # The listener thread does not survive fork and the inherited queue's locks may have been held by it,
+    # so each worker gets a fresh queue and listener thread
+    global _listener
+    _handler.queue = queue.Queue(maxsize=_handler.queue.maxsize)
+    _listener = logging.handlers.QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+def init_app(app):
+    # LOG_LEVEL for everything, LOG_LEVELS for per-module overrides, LOG_DEBUG_RATE for DEBUG records per
+    # message per second, LOG_QUEUE_SIZE for records buffered before new ones are dropped
+    app.config.setdefault('LOG_LEVEL', os.getenv('LOG_LEVEL', 'INFO'))
+    app.config.setdefault('LOG_LEVELS', os.getenv('LOG_LEVELS', ''))
+    app.config.setdefault('LOG_DEBUG_RATE', int(os.getenv('LOG_DEBUG_RATE', 10)))
+    app.config.setdefault('LOG_QUEUE_SIZE', int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    configure(app.config['LOG_LEVEL'], app.config['LOG_LEVELS'],
+              queue_size=app.config['LOG_QUEUE_SIZE'], debug_rate=app.config['LOG_DEBUG_RATE'])
+
+    @app.before_request
+    def assign_request_id():
+        # Reuse the id of an upstream proxy when there is one so logs can be joined across services
+        g.request_id_token = request_id.set(request.headers.get("X-Request-ID", "")[:64] or uuid.uuid4().hex)
+
+    @app.after_request
+    def return_request_id(response):
+        if request_id.get():
+            response.headers["X-Request-ID"] = request_id.get()
+        return response
+
+    @app.teardown_request
+    def clear_request_id(exc):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            request_id.reset(token)
@@ -1,12 +1,28 @@
+import logging
 from flask import jsonify, Blueprint, render_template, request, session, redirect, url_for, flash, current_app
 from bson.objectid import ObjectId
-from werkzeug.security import generate_password_hash
 from bson.json_util import dumps
 from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from src import mongo
-import uuid
+from src.bulk import insert_many_chunked
+from src.cache import get_teacher_classes, get_student_names, student_list, invalidate_student, invalidate_teacher, stats as cache_stats
+from src.concurrency import run_concurrently
+from src.conditional import conditional
+from src.querylog import query_budget
+from src.passwords import hash_password
+from src.roster_import import import_roster, REQUIRED_COLUMNS
+from src.search import search_users, shadow_fields
+from src import rollups
+from src.attendance import record_attendance, find_attendance
+from src.dates import parse_date, format_date, date_equals, date_since, today
 
 main = Blueprint('main', __name__)
+logger = logging.getLogger(__name__)
+
+# Users shown per page of search results
+USER_SEARCH_PAGE_SIZE = 25
 
 # Helper function to check role
 def verify_role(required_role):
@@ -34,6 +50,7 @@ def student_assignments_homework():
 
 
 @main.route('/api/student_classes', methods=['GET'])
+@conditional(max_age=300)
 def api_student_classes():
     # The logged-in student's username is assumed to be their student_id.
     student_id = session.get('username')
@@ -73,41 +90,14 @@ def api_student_assignments_homework():
     now_date = datetime.now().date()
 
     for assignment in assignments:
-        # Parse and reformat assigned_date
-        try:
-            try:
-                dt_assigned = datetime.strptime(assignment['assigned_date'], "%m/%d/%Y")
-            except ValueError:
-                dt_assigned = datetime.strptime(assignment['assigned_date'], "%Y-%m-%d")
-            assignment['assigned_date'] = dt_assigned.strftime("%m/%d/%Y")
-        except Exception as e:
-            assignment['assigned_date'] = assignment.get('assigned_date', '')
-
-        # Parse and reformat due_date
-        try:
-            try:
-                dt_due = datetime.strptime(assignment['due_date'], "%m/%d/%Y")
-            except ValueError:
-                dt_due = datetime.strptime(assignment['due_date'], "%Y-%m-%d")
-            assignment['due_date'] = dt_due.strftime("%m/%d/%Y")
-        except Exception as e:
-            assignment['due_date'] = assignment.get('due_date', '')
-
-        # Parse and reformat graded_date if it exists
-        try:
-            if assignment.get('graded_date'):
-                try:
-                    dt_graded = datetime.strptime(assignment['graded_date'], "%m/%d/%Y")
-                except ValueError:
-                    dt_graded = datetime.strptime(assignment['graded_date'], "%Y-%m-%d")
-                assignment['graded_date'] = dt_graded.strftime("%m/%d/%Y")
-            else:
-                assignment['graded_date'] = ""
-        except Exception as e:
-            assignment['graded_date'] = assignment.get('graded_date', '')
+        # Dates may be native or legacy strings until migrate-dates has run
+        dt_due = parse_date(assignment.get('due_date'))
+        assignment['assigned_date'] = format_date(assignment.get('assigned_date'))
+        assignment['due_date'] = format_date(assignment.get('due_date'))
+        assignment['graded_date'] = format_date(assignment.get('graded_date'))
 
         # Determine if the due_date has passed (compare only the date part)
-        if dt_due.date() <= now_date:
+        if dt_due and dt_due.date() <= now_date:
             graded_assignments.append(assignment)
         else:
             upcoming_assignments.append(assignment)
@@ -121,45 +111,64 @@ def student_class_schedule():
         return render_template('student/student_class_schedule.html')
     return redirect(url_for('auth.home'))
 
+# Builds class schedules for one or more students in one aggregation on Teacher Profile. Only the teacher's
+# classes containing the students leave the database, each joined to the schedule from that student's enrolled_classes.
+def class_schedule_pipeline(student_ids):
+    return [
+        {"$match": {"assigned_classes.students_enrolled": {"$in": student_ids}}},
+        {"$project": {"name": 1, "email": 1, "phone": 1, "assigned_classes": 1}},
+        {"$unwind": "$assigned_classes"},
+        {"$unwind": "$assigned_classes.students_enrolled"},
+        {"$match": {"assigned_classes.students_enrolled": {"$in": student_ids}}},
+        {"$lookup": {
+            "from": "Student Profile",
+            "let": {"class_id": "$assigned_classes.class_id", "student_id": "$assigned_classes.students_enrolled"},
+            "pipeline": [
+                {"$match": {"student_id": {"$in": student_ids}}},
+                {"$match": {"$expr": {"$eq": ["$student_id", "$$student_id"]}}},
+                {"$unwind": "$enrolled_classes"},
+                {"$match": {"$expr": {"$eq": ["$enrolled_classes.class_id", "$$class_id"]}}},
+                {"$project": {"_id": 0, "schedule": "$enrolled_classes.schedule"}}
+            ],
+            "as": "enrollment"
+        }},
+        {"$project": {
+            "_id": 0,
+            "student_id": "$assigned_classes.students_enrolled",
+            "teacher_name": {"$ifNull": ["$name", ""]},
+            "class_number": {"$ifNull": ["$assigned_classes.class_id", ""]},
+            "class_name": {"$ifNull": ["$assigned_classes.subject", ""]},
+            "schedule": {"$ifNull": [{"$arrayElemAt": ["$enrollment.schedule", 0]}, "N/A"]},
+            "email": {"$ifNull": ["$email", ""]},
+            "phone": {"$ifNull": ["$phone", ""]}
+        }}
+    ]
+
+# Returns {student_id: [schedule rows]} for the given students
+def get_class_schedules(student_ids):
+    schedules = {student_id: [] for student_id in student_ids}
+    for row in mongo.db["Teacher Profile"].aggregate(class_schedule_pipeline(list(student_ids))):
+        schedules[row.pop("student_id")].append(row)
+    return schedules
+
+def get_class_schedule(student_id):
+    return get_class_schedules([student_id])[student_id]
+
 @main.route('/api/student_class_schedule', methods=['GET'])
+@conditional(max_age=300)
 def api_student_class_schedule():
     # Get the logged-in student's ID (assumed stored in session as username)
     student_id = session.get("username")
     if not student_id:
         return jsonify({"error": "User not logged in"}), 401
 
-    # Retrieve the student profile to get the enrolled_classes array.
-    student = mongo.db["Student Profile"].find_one(
-        {"student_id": student_id},
-        {"enrolled_classes": 1, "_id": 0}
-    )
-    if not student:
-        return jsonify({"error": "Student profile not found"}), 404
-
-    # Build a mapping from class_id to the student's schedule.
-    enrolled_classes = student.get("enrolled_classes", [])
-    schedule_mapping = {cls.get("class_id"): cls.get("schedule", "N/A") for cls in enrolled_classes}
+    # Build the combined schedule list
+    schedule = get_class_schedule(student_id)
 
-    # Find teacher profiles whose assigned_classes contain the student.
-    teacher_profiles = list(mongo.db["Teacher Profile"].find(
-        {"assigned_classes.students_enrolled": student_id},
-        {"name": 1, "email": 1, "phone": 1, "assigned_classes": 1, "_id": 0}
-    ))
+    # Only an empty schedule needs the extra check for a missing profile
+    if not schedule and not mongo.db["Student Profile"].find_one({"student_id": student_id}, {"_id": 1}):
+        return jsonify({"error": "Student profile not found"}), 404
 
-    # Build the combined schedule list.
-    schedule = []
-    for teacher in teacher_profiles:
-        for cls in teacher.get("assigned_classes", []):
-            if student_id in cls.get("students_enrolled", []):
-                class_id = cls.get("class_id", "")
-                schedule.append({
-                    "teacher_name": teacher.get("name", ""),
-                    "class_number": class_id,
-                    "class_name": cls.get("subject", ""),
-                    "schedule": schedule_mapping.get(class_id, "N/A"),
-                    "email": teacher.get("email", ""),
-                    "phone": teacher.get("phone", "")
-                })
     return jsonify({"schedule": schedule})
 
 
@@ -171,6 +180,7 @@ def student_bus_schedule():
 
 
 @main.route('/api/student_bus_schedule', methods=['GET'])
+@conditional(max_age=300)
 def api_student_bus_schedule():
     # Get the logged-in student's ID from the session.
     student_id = session.get("username")
@@ -206,22 +216,19 @@ def teacher_assign_grades():
 
 # Retrieve students assigned to logged-in teacher
 @main.route('/grades_get_students', methods=['GET'])
+@conditional()
 def grades_get_students():
 
     teacher_id = session.get('username')
-    teacher_profile = mongo.db["Teacher Profile"].find_one({"teacher_id": teacher_id}) # Matches teacher Username from session to teacher_id in MongoDB Teacher Profile collection
+    assigned_classes = get_teacher_classes(teacher_id) # Matches teacher Username from session to teacher_id in Teacher Profile (cached per worker)
     
-    if not teacher_profile:
+    if assigned_classes is None:
         return jsonify({"error": "Teacher profile not found"}), 404 # Error if username does not match existing teacher_id
     
-    assigned_classes = teacher_profile.get("assigned_classes", []) # Retrieves assigned classes for teacher_id in assigned_classes array 
     student_ids = [student for cls in assigned_classes for student in cls.get("students_enrolled", [])] # Retrieves student_id for students_enrolled array in Teacher Profile
     
-    students = mongo.db["Student Profile"].find({"student_id": {"$in": student_ids}}, # Matches retreived student_id from Teacher Profile to student_id in Student Profile
-                                                  {"student_id": 1, "first_name": 1, "last_name": 1, "_id": 0}) 
-    student_list = [{"id": s["student_id"], "name": f"{s['first_name']} {s['last_name']}"} for s in students] # Defines student's name as First Name Last Name
-    
-    return jsonify({"students": student_list})
+    # Defines student's name as First Name Last Name; names are cached and only misses go to Student Profile
+    return jsonify({"students": student_list(student_ids)})
 
 # Retrieves existing assignments from assignments_grades collection
 @main.route('/get_student_grades/<student_id>', methods=['GET'])
@@ -232,100 +239,158 @@ def get_student_grades(student_id):
         {"_id": 0, "assignment_name": 1, "assigned_date": 1, "grade": 1, "class_number": 1, "due_date": 1}
     )
 
-    # Formats date as MM/DD/YYYY instead of YYYY-MM-DD
-    def format_date(date_str):
-        if not date_str:
-            return ""
-        try:
-            # Attempt to parse assuming it's already in MM/DD/YYYY
-            dt = datetime.strptime(date_str, "%m/%d/%Y")
-            return dt.strftime("%m/%d/%Y")
-        except ValueError:
-            try:
-                # Otherwise, try YYYY-MM-DD and convert it to MM/DD/YYYY
-                dt = datetime.strptime(date_str, "%Y-%m-%d")
-                return dt.strftime("%m/%d/%Y")
-            except ValueError:
-                # If parsing fails, return the original string
-                return date_str
-
     # Returns assignments per student
     assignments = [
         {
             "id": g["assignment_name"],
             "name": g["assignment_name"],
-            "assigned_date": format_date(g.get("assigned_date", "")),
-            "due_date": format_date(g.get("due_date", "")),
+            "assigned_date": format_date(g.get("assigned_date")), # Formats date as MM/DD/YYYY
+            "due_date": format_date(g.get("due_date")),
+            "class_number": g.get("class_number"),
             "grade": g.get("grade", "")
         }
         for g in grades
     ]
     return jsonify({"assignments": assignments})
 
+# Validates one grade entry, returning (filter, update) for assignments_grades or an error message
+def build_grade_update(entry, graded_date):
+    student_id = entry.get('student_id')
+    assignment_name = entry.get('assignment_name')
+    assigned_date = entry.get('assigned_date')
+    grade = entry.get('grade')
+
+    # Returns error if there is no match on student, assignment, assigned date, or grade
+    if not student_id or not assignment_name or not assigned_date or grade is None:
+        return None, "Missing required fields"
+    if not parse_date(assigned_date):
+        return None, "Invalid assigned date"
+
+    # assigned_date may be stored natively or as a string
+    grade_filter = {
+        "student_id": student_id,
+        "assignment_name": assignment_name,
+        "assigned_date": date_equals(assigned_date)
+    }
+    # A student in two of a teacher's classes has one row per class; class_number picks the row
+    if entry.get('class_number'):
+        grade_filter["class_number"] = entry['class_number']
+    return (grade_filter, {"$set": {"grade": grade, "graded_date": graded_date}}), None
+
 # Submit or update grade for each student assignment
 @main.route('/submit_grade', methods=['POST'])
+@query_budget(4)
 def submit_grade():
 
     try:
         data = request.json
-        print("[DEBUG] Received data:", data) # Used for debugging if errors are returned
-
-        student_id = data.get('student_id')
-        assignment_name = data.get('assignment_name')
-        assigned_date = data.get('assigned_date')
-        grade = data.get('grade')
-
-        # Returns error if there is no match on student, assignment, assigned date, or grade
-        if not student_id or not assignment_name or not assigned_date or grade is None:
-            print("[ERROR] Missing fields:", student_id, assignment_name, assigned_date, grade)
-            return jsonify({"error": "Missing required fields"}), 400
-
-        # Convert current date to MM/DD/YYYY format for graded_date upon submission
-        formatted_graded_date = datetime.utcnow().strftime("%m/%d/%Y")
-
-        print(f"[DEBUG] Searching MongoDB for: student_id={student_id}, assignment_name={assignment_name}, assigned_date={assigned_date}") # Used for debugging if errors are returned
-
-        # Fetch the actual data from MongoDB and log it
-        matching_docs = list(mongo.db["assignments_grades"].find({"student_id": student_id}))
-        print(f"[DEBUG] MongoDB Documents for student {student_id}:") # Used for debugging if errors are returned
-        for doc in matching_docs:
-            print(doc)
-
-        # Check if the document exists before updating
-        existing_doc = mongo.db["assignments_grades"].find_one(
-            {
-                "student_id": student_id,
-                "assignment_name": assignment_name,
-                "assigned_date": assigned_date
-            }
+        # Keys only; DEBUG records are rate limited so this stays cheap on the gradebook hot path
+        logger.debug("submit_grade received", extra={"student_id": (data or {}).get("student_id"),
+                                                     "assignment_name": (data or {}).get("assignment_name")})
+
+        # Stores the submission date as graded_date
+        operation, error = build_grade_update(data, today())
+        if error:
+            logger.info("submit_grade rejected: %s", error)
+            return jsonify({"error": error}), 400
+
+        # Updates the grade in MongoDB and returns the previous values; no document replaces a separate existence check
+        previous = mongo.db["assignments_grades"].find_one_and_update(
+            *operation,
+            projection={"class_number": 1, "grade": 1, "graded_date": 1, "_id": 0},
+            return_document=ReturnDocument.BEFORE
         )
 
-        if not existing_doc:
-            print("[ERROR] No matching document found in MongoDB!")
+        if previous is None:
+            logger.info("submit_grade found no matching assignment", extra={"student_id": data.get("student_id")})
             return jsonify({"error": "Assignment not found. Check student ID, assignment name, and assigned date."}), 400 # Error on page if mongoDB record does not exist
 
-        # Updates the grade in MongoDB
-        update_result = mongo.db["assignments_grades"].update_one(
-            {
-                "student_id": student_id,
-                "assignment_name": assignment_name,
-                "assigned_date": assigned_date  
-            },
-            {"$set": {"grade": grade, "graded_date": formatted_graded_date}},
-            upsert=False  
-        )
-
-        print("[DEBUG] MongoDB Update Result:", update_result.raw_result) # Debugging output for error checks
-
-        if update_result.modified_count > 0:
+        grade = operation[1]["$set"]["grade"]
+        if previous.get("grade") != grade or previous.get("graded_date") != operation[1]["$set"]["graded_date"]:
+            rollups.apply_grades([(data["student_id"], previous.get("class_number"), previous.get("grade"), grade)])
             return jsonify({"message": "Grade submitted successfully!"}) # Message on page for successful submission
         else:
             return jsonify({"message": "No changes made. Verify data."}), 400 # Message on page if no changes submitted
 
     except Exception as e:
-        print("[ERROR] Exception:", str(e))
+        logger.exception("submit_grade failed")
         return jsonify({"error": "Server error: " + str(e)}), 500
 
+# Submit a batch of grades (a gradebook row or column) in one request
+@main.route('/submit_grades', methods=['POST'])
+@query_budget(3, per_item='grades')
+def submit_grades():
+    if session.get('role') != 'Teacher':
+        return jsonify({"error": "Access denied"}), 403
+
+    data = request.json or {}
+    entries = data.get('grades')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "grades must be a non-empty list"}), 400
+
+    # Only assignments in the teacher's own classes can be matched; others are reported as not found
+    class_ids = {cls["class_id"] for cls in get_teacher_classes(session.get('username')) or []}
+
+    # Validates every entry in memory before writing anything
+    graded_date = today()
+    results = []
+    operations = []
+    for index, entry in enumerate(entries):
+        entry = entry if isinstance(entry, dict) else {}
+        # class_number is required here so every entry matches exactly one row
+        if isinstance(entry.get('class_number'), str) and entry['class_number']:
+            operation, error = build_grade_update(entry, graded_date)
+        else:
+            operation, error = None, "Missing required fields"
+        if error:
+            results.append({"index": index, "status": "error", "error": error})
+        elif entry['class_number'] not in class_ids:
+            results.append({"index": index, "status": "not_found",
+                            "error": "Assignment not found. Check student ID, assignment name, and assigned date."})
+        else:
+            results.append({"index": index, "status": "updated"})
+            operations.append((index, operation))
+
+    changes = []
+    try:
+        # One find_one_and_update per entry, in submission order: each returns the row it changed, so entries
+        # without a row are reported as not found, and the rollups get that row's class and the grade it
+        # replaced even when another submission updates the same grade at the same time
+        for index, (grade_filter, update) in operations:
+            previous = mongo.db["assignments_grades"].find_one_and_update(
+                grade_filter, update,
+                projection={"class_number": 1, "grade": 1, "_id": 0},
+                return_document=ReturnDocument.BEFORE
+            )
+            if previous is None:
+                results[index] = {"index": index, "status": "not_found",
+                                  "error": "Assignment not found. Check student ID, assignment name, and assigned date."}
+            else:
+                changes.append((entries[index]["student_id"], previous.get("class_number"), previous.get("grade"), update["$set"]["grade"]))
+    except PyMongoError as e:
+        return jsonify({"error": "Server error: " + str(e)}), 500
+    finally:
+        # Counts every write that went through, including those before a failure
+        rollups.apply_grades(changes)
+
+    updated = sum(1 for result in results if result["status"] == "updated")
+    return jsonify({"updated": updated, "failed": len(results) - updated, "results": results})
+
+# Builds one assignments_grades row per enrolled student across the teacher's classes
+def build_homework_rows(assigned_classes, assignment_name, assigned_date, due_date):
+    for cls in assigned_classes:
+        class_id = cls["class_id"]
+        for student_id in cls.get("students_enrolled", []):
+            yield {
+                "class_number": class_id,
+                "assignment_name": assignment_name,
+                "assigned_date": assigned_date,
+                "student_id": student_id,
+                "due_date": due_date,
+                "grade": None,
+                "graded_date": None
+            }
+
 # Assigns homework for each student in the enrolled_students for Teacher Profile
 @main.route('/assign_homework', methods=['POST'])
 def assign_homework():
@@ -340,34 +405,52 @@ def assign_homework():
         return jsonify({"error": "All fields are required"}), 400 # Error on page if field is missing
 
     try:
-        # Ensures assigned_date is in MM/DD/YYYY format
-        assigned_date = datetime.strptime(assigned_date, "%m/%d/%Y").strftime("%m/%d/%Y")
+        # Ensures assigned_date is in MM/DD/YYYY format and stores both dates as native dates
+        assigned_date = datetime.strptime(assigned_date, "%m/%d/%Y")
     except ValueError:
         return jsonify({"error": "Invalid date format. Use MM/DD/YYYY"}), 400 # Error on page if format is incorrect
+    due_date = parse_date(due_date)
+    if not due_date:
+        return jsonify({"error": "Invalid due date format"}), 400
 
     # Checks teacher_id in Teacher Profile
-    teacher_profile = mongo.db["Teacher Profile"].find_one({"teacher_id": teacher_id})
+    teacher_profile = mongo.db["Teacher Profile"].find_one(
+        {"teacher_id": teacher_id},
+        {"assigned_classes.class_id": 1, "assigned_classes.students_enrolled": 1, "_id": 0}
+    )
     if not teacher_profile:
         return jsonify({"error": "Teacher profile not found"}), 404
 
     # Checks assigned_classes array in Teacher Profile for classes assigned to user
     assigned_classes = teacher_profile.get("assigned_classes", [])
-    
-    # Sets assignment information in assignments_grades for class_id and students_enrolled from Teacher Profile
-    for cls in assigned_classes:
-        class_id = cls["class_id"]
-        for student_id in cls.get("students_enrolled", []):
-            mongo.db["assignments_grades"].insert_one({
-                "class_number": class_id,
-                "assignment_name": assignment_name,
-                "assigned_date": assigned_date,
-                "student_id": student_id,
-                "due_date": due_date,
-                "grade": None,
-                "graded_date": None
-            })
 
-    return jsonify({"message": "Homework assigned successfully!"}) # Success message on assignments page
+    # Sets assignment information in assignments_grades for class_id and students_enrolled from Teacher Profile
+    # Rows are written with chunked unordered bulk inserts; rows that already exist are skipped by the
+    # assignment_key unique index declared in src/indexes.py
+    rows = build_homework_rows(assigned_classes, assignment_name, assigned_date, due_date)
+    result = insert_many_chunked(mongo.db["assignments_grades"], rows, on_inserted=rollups.apply_assignments)
+
+    return jsonify({
+        "message": "Homework assigned successfully!", # Success message on assignments page
+        "inserted": result["inserted"],
+        "duplicates": result["duplicates"]
+    })
+
+# Statuses a teacher can record for a student
+ATTENDANCE_STATUSES = ("Present", "Late", "Absent")
+
+# Checks a roll call against the class roster, returning (statuses to write, {student_id: error})
+def validate_roll_call(roster, statuses):
+    valid = {}
+    errors = {}
+    for student_id, status in statuses.items():
+        if student_id not in roster:
+            errors[student_id] = "Student not enrolled in class"
+        elif status not in ATTENDANCE_STATUSES:
+            errors[student_id] = "Invalid status"
+        else:
+            valid[student_id] = status
+    return valid, errors
 
 # Attendance for students assigned to teacher
 @main.route('/teacher_attendance', methods=['GET', 'POST'])
@@ -375,72 +458,93 @@ def teacher_attendance():
     if not verify_role('Teacher'):
         return redirect(url_for('auth.home'))
 
-    teacher_profile = session.get('teacher_profile') # Checks teacher_id in Teacher Profile
+    # Retrieves classes from assigned_classes array in Teacher Profile. Not copied into the session store: a copy
+    # taken at login would stay stale for the whole session, while the per-worker cache expires within ROSTER_CACHE_TTL
+    assigned_classes = get_teacher_classes(session.get('username'))
 
-    if not teacher_profile:
-        flash("Session expired. Please log in again.", "error") # Error message if not a teacher
+    if assigned_classes is None:
+        flash("Teacher profile not found.", "error") # Error message if not a teacher
         return redirect(url_for('auth.home'))
 
-    assigned_classes = teacher_profile.get('assigned_classes', []) # Retrieves classes from assigned_classes array in Teacher Profile
-
-    fourteen_days_ago = (datetime.now() - timedelta(days=14)).strftime('%Y-%m-%d') # Displays past 14 days of data
+    fourteen_days_ago = today() - timedelta(days=14) # Displays past 14 days of data
 
     # Get selected class and student from request
     selected_class_id = request.args.get('class_id') or (assigned_classes[0]['class_id'] if assigned_classes else None)
     selected_student_id = request.args.get('student_id')
 
+    # Handle POST request to submit roll call for a whole class
+    if request.method == 'POST' and request.form.get('mode') == 'roll_call':
+        class_id = request.form.get('class_id')
+        date = parse_date(request.form.get('date'))
+        selected_class = next((cls for cls in assigned_classes if cls["class_id"] == class_id), None)
+
+        if not (selected_class and date):
+            flash("Class and date are required!", "error")
+        else:
+            # One status-<student_id> field per student in the class
+            statuses = {key[len("status-"):]: value for key, value in request.form.items() if key.startswith("status-")}
+            valid, errors = validate_roll_call(set(selected_class.get('students_enrolled', [])), statuses)
+            result = record_attendance(class_id, date, valid)
+            if errors:
+                flash(f"Roll call saved for {len(valid)} students; {len(errors)} entries were rejected.", "error")
+            else:
+                flash(f"Roll call saved: {result['inserted']} added, {result['updated']} updated.", "success")
+
+        return redirect(url_for('main.teacher_attendance', class_id=class_id))
+
     # Handle POST request to submit new attendance
     if request.method == 'POST':
         student_id = request.form.get('student_id')
-        date = request.form.get('date')
+        date = parse_date(request.form.get('date'))
         status = request.form.get('status')
         class_id = request.form.get('class_id')
+        selected_class = next((cls for cls in assigned_classes if cls["class_id"] == class_id), None)
 
-        if not (student_id and date and status and class_id):
+        if not (student_id and date and status and selected_class):
             flash("All fields are required!", "error") # Error message if field is not found
         else:
-            # Generate a unique _id for loggingin MongoDB
-            attendance_id = str(uuid.uuid4())
-
-            # Insert into MongoDB
-            mongo.db.Attendance.insert_one({
-                "_id": attendance_id,
-                "student_id": student_id,
-                "date": date,
-                "status": status,
-                "class_id": class_id
-            })
+            # Checked against the class roster and the allowed statuses, as a roll call is
+            valid, errors = validate_roll_call(set(selected_class.get('students_enrolled', [])), {student_id: status})
+            if errors:
+                flash(f"Attendance not saved: {errors[student_id]}.", "error")
+            else:
+                # Upserted per student, class and day so a double submit does not create a duplicate record
+                record_attendance(class_id, date, valid)
 
-            flash("Attendance record added successfully!", "success") # Success message on page for successful entry
+                flash("Attendance record added successfully!", "success") # Success message on page for successful entry
 
         # Redirect to refresh the page and show updated records
         return redirect(url_for('main.teacher_attendance', class_id=class_id, student_id=student_id))
 
+    # Only one of the teacher's own classes can be viewed; without one there is nothing to show
+    selected_class = next((cls for cls in assigned_classes if cls["class_id"] == selected_class_id), None)
+    if not selected_class:
+        return render_template(
+            'teacher/teacher_attendance.html',
+            assigned_classes=assigned_classes,
+            selected_class_id=None,
+            selected_student_id=None,
+            student_data={},
+            records=[]
+        )
+
     # Get students from the selected class
-    student_ids = []
-    if selected_class_id:
-        selected_class = next((cls for cls in assigned_classes if cls["class_id"] == selected_class_id), None)
-        if selected_class:
-            student_ids = selected_class.get('students_enrolled', [])
-
-            # Auto-select first student if none is selected
-            if not selected_student_id and student_ids:
-                selected_student_id = student_ids[0]
-
-    # Retrieve student names from "Student Profile"
-    student_data = {s['student_id']: f"{s['first_name']} {s['last_name']}" for s in mongo.db["Student Profile"].find(
-        {"student_id": {"$in": student_ids}}, {"student_id": 1, "first_name": 1, "last_name": 1, "_id": 0}
-    )}
-
-    # Filter attendance records by class and selected student
-    filter_query = {
-        'class_id': selected_class_id,
-        'date': {'$gte': fourteen_days_ago}
-    }
-    if selected_student_id:
-        filter_query['student_id'] = selected_student_id
+    student_ids = selected_class.get('students_enrolled', [])
 
-    records = list(mongo.db.Attendance.find(filter_query))
+    # Auto-select first student if none is selected
+    if not selected_student_id and student_ids:
+        selected_student_id = student_ids[0]
+
+    # Student names from "Student Profile" (cached per worker) and the attendance records filtered by class and
+    # selected student (read from the configured attendance layout) are independent, so both are read at once
+    student_data, records = run_concurrently(
+        lambda: get_student_names(student_ids),
+        lambda: find_attendance(
+            fourteen_days_ago,
+            class_id=selected_class_id,
+            student_ids=[selected_student_id] if selected_student_id else None
+        )
+    )
 
     # Attach student names to records
     for record in records:
@@ -455,19 +559,42 @@ def teacher_attendance():
         records=records
     )
 
+# JSON roll call for the attendance page: {"class_id", "date", "statuses": {student_id: status}}
+@main.route('/api/attendance/roll_call', methods=['POST'])
+def api_attendance_roll_call():
+    if session.get('role') != 'Teacher':
+        return jsonify({"error": "Access denied"}), 403
+
+    data = request.json or {}
+    class_id = data.get('class_id')
+    date = parse_date(data.get('date'))
+    statuses = data.get('statuses')
+    if not class_id or not date or not isinstance(statuses, dict):
+        return jsonify({"error": "class_id, date and statuses are required"}), 400
+
+    assigned_classes = get_teacher_classes(session.get('username')) or []
+    selected_class = next((cls for cls in assigned_classes if cls['class_id'] == class_id), None)
+    if not selected_class:
+        return jsonify({"error": "Class not found"}), 404
+
+    valid, errors = validate_roll_call(set(selected_class.get('students_enrolled', [])), statuses)
+    result = record_attendance(class_id, date, valid)
+    return jsonify({**result, "errors": errors})
+
 # Works with Teacher Attendance to students based on selected class
 @main.route('/get_students/<class_id>')
+@conditional()
 def get_students(class_id):
 
     teacher_id = session.get('username')
 
-    teacher_profile = mongo.db["Teacher Profile"].find_one({"teacher_id": teacher_id}) # Matches session username to teacher_id in Teacher Profile
-    if not teacher_profile:
+    assigned_classes = get_teacher_classes(teacher_id) # Matches session username to teacher_id in Teacher Profile (cached per worker)
+    if assigned_classes is None:
         return {"error": "Teacher profile not found"}, 404 # Error if teacher_id not located
 
     # Find the selected class inside assigned_classes array
     selected_class = next(
-        (cls for cls in teacher_profile.get('assigned_classes', []) if cls['class_id'] == class_id),
+        (cls for cls in assigned_classes if cls['class_id'] == class_id),
         None
     )
 
@@ -477,11 +604,8 @@ def get_students(class_id):
     # Extract student IDs from the selected class
     student_ids = selected_class.get('students_enrolled', [])
 
-    # Fetch student details from "Student Profile"
-    students = list(mongo.db["Student Profile"].find({"student_id": {"$in": student_ids}}, 
-                                                      {"student_id": 1, "first_name": 1, "last_name": 1, "_id": 0}))
-
-    return {"students": [{"id": s['student_id'], "name": f"{s['first_name']} {s['last_name']}"} for s in students]}
+    # Fetch student names from "Student Profile" (cached per worker)
+    return {"students": student_list(student_ids)}
 
 # View Student Profiles
 @main.route('/teacher_student_profiles')
@@ -492,30 +616,32 @@ def teacher_student_profiles():
 
 # Matches information from Teacher Profile to Student Profile
 @main.route('/profile_get_students', methods=['GET'])
+@conditional()
 def profile_get_students():
-    # Matches signed-in Teacher Username to teacher_id in Teacher Profile collection
+    # Matches signed-in Teacher Username to teacher_id in Teacher Profile collection (cached per worker)
     teacher_id = session.get('username')
-    teacher_profile = mongo.db["Teacher Profile"].find_one({"teacher_id": teacher_id})
+    assigned_classes = get_teacher_classes(teacher_id)
     
-    if not teacher_profile:
+    if assigned_classes is None:
         return jsonify({"error": "Teacher profile not found"}), 404
     
     # Retrieves assigned_classes from the Teacher Profile Collection
-    assigned_classes = teacher_profile.get("assigned_classes", [])
     student_ids = [student for cls in assigned_classes for student in cls.get("students_enrolled", [])] # Obtains students enrolled from the students_enrolled array
     
-    # Matches students enrolled to student_id in the Student Profile collection
-    students = mongo.db["Student Profile"].find({"student_id": {"$in": student_ids}}, 
-                                                  {"student_id": 1, "first_name": 1, "last_name": 1, "_id": 0}) # Gets the student ID, first name, and last name
-    student_list = [{"id": s["student_id"], "name": f"{s['first_name']} {s['last_name']}"} for s in students]
-    
-    return jsonify({"students": student_list})
+    # Matches students enrolled to student_id in the Student Profile collection for first and last names
+    return jsonify({"students": student_list(student_ids)})
 
 # Retrieves the student profile information from the Student Profile collection
 @main.route('/get_student_profile/<student_id>', methods=['GET'])
+@query_budget(2)
+@conditional()
 def get_student_profile(student_id):
-    # Matches student ID obtained to the student_id in the Student Profile collection
-    student = mongo.db["Student Profile"].find_one({"student_id": student_id}, {"_id": 0})
+    # Matches student ID obtained to the student_id in the Student Profile collection, while the
+    # Bus Routes lookup (which only needs the ID) runs at the same time
+    student, bus_info = run_concurrently(
+        lambda: mongo.db["Student Profile"].find_one({"student_id": student_id}, {"_id": 0}),
+        lambda: mongo.db["Bus Routes"].find_one({"students": student_id}, {"_id": 0})
+    )
     
     if not student:
         return jsonify({"error": "Student not found"}), 404
@@ -530,9 +656,7 @@ def get_student_profile(student_id):
             if "relation" not in contact or not contact["relation"]:
                 contact["relation"] = "Unknown"
 
-    # Retrieve Bus Schedule from Bus Routes Collection student array
-    bus_info = mongo.db["Bus Routes"].find_one({"students": student_id}, {"_id": 0})
-    
+    # Bus Schedule from Bus Routes Collection student array
     if bus_info:
         stops = bus_info.get("stops", [])
         student["bus_schedule"] = "<br>".join(
@@ -559,22 +683,37 @@ def manage_users_permissions():
         flash("Access denied. Only administrators can manage users.", "error")
         return redirect(url_for('auth.home'))
 
-    # Allows Admin user to search for specific user based on username or email address in users collection
+    # Allows Admin user to search for specific user based on username or email address prefix in users collection
     users = []
+    has_more = False
+    search_query = None
+    page = 0
     if request.method == 'POST':
         search_query = request.form.get('search_query')
+        page = request.form.get('page', 0, type=int)
         if search_query:
-            users = list(mongo.db.users.find({
-                "$or": [
-                    {"username": {'$regex': search_query, '$options': 'i'}},
-                    {"email": {'$regex': search_query, '$options': 'i'}}
-                ]
-            }))
+            users, has_more = search_users(search_query, page=page, limit=USER_SEARCH_PAGE_SIZE)
     
-    return render_template('admin/manage_users_permissions.html', users=users)
+    return render_template('admin/manage_users_permissions.html', users=users, has_more=has_more,
+                           search_query=search_query, page=page)
+
+# Autocomplete for the user search box
+@main.route('/api/users/search', methods=['GET'])
+def api_users_search():
+    if 'role' not in session or session['role'] != 'Administrator':
+        return jsonify({"error": "Access denied"}), 403
+
+    users, has_more = search_users(
+        request.args.get('q'),
+        page=request.args.get('page', 0, type=int),
+        limit=request.args.get('limit', 10, type=int),
+        fuzzy=request.args.get('fuzzy') == '1'
+    )
+    return jsonify({"users": users, "has_more": has_more})
 
 # Update users information (username, email, role, or password)
 @main.route('/update_user', methods=['POST'])
+@query_budget(3)
 def update_user():
     if 'role' not in session or session['role'] != 'Administrator':
         flash("Access denied.", "error")
@@ -589,24 +728,40 @@ def update_user():
         flash("All fields are required.", "error")
         return redirect(url_for('main.manage_users_permissions'))
     
-    # Get the current user record before update.
-    user_before = mongo.db.users.find_one({"username": username})
+    if update_field == "password":
+        # The user must exist before the deliberately slow hash is paid for
+        if not mongo.db.users.find_one({"username": username}, {"_id": 1}):
+            flash("User not found.", "error")
+            return redirect(url_for('main.manage_users_permissions'))
+        new_value = hash_password(new_value) # Hashes new password before storing in MongoDB
+    
+    # Perform the update in MongoDB, keeping the lowercase search fields in sync. The same round trip
+    # returns the user record from before the update, so the user is not read again before or after.
+    update = {update_field: new_value}
+    try:
+        user_before = mongo.db.users.find_one_and_update(
+            {"username": username},
+            {"$set": {**update, **shadow_fields(update)}},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        # Renaming onto a taken username violates the unique username index
+        flash("Username already exists.", "error")
+        return redirect(url_for('main.manage_users_permissions'))
     if not user_before:
         flash("User not found.", "error")
         return redirect(url_for('main.manage_users_permissions'))
     
     # Store the previous value of the field being updated.
     previous_value = "hashed" if update_field == "password" else user_before.get(update_field, "Unknown") # Returns value 'hashed' for Previous Value if updating password
+
+    # Renames invalidate any cached roster or display name keyed on this username
+    if update_field in ("username", "name"):
+        invalidate_teacher(username)
+        invalidate_student(username)
     
-    if update_field == "password":
-        new_value = generate_password_hash(new_value) # Hashes new password before storing in MongoDB
-    
-    # Perform the update in MongoDB
-    mongo.db.users.update_one({"username": username}, {"$set": {update_field: new_value}})
-    
-    # If username was updated, query using the new value.
-    query = {"username": new_value} if update_field == "username" else {"username": username}
-    updated_user = mongo.db.users.find_one(query)
+    # The user as updated is the record from before with the new value applied
+    updated_user = {**user_before, **update}
     
     # Create the audit log entry using the updated values.
     audit_entry = {
@@ -625,6 +780,68 @@ def update_user():
     flash("User information updated successfully.", "success")
     return redirect(url_for('main.manage_users_permissions'))
 
+# Hit/miss counters for this worker's roster and student name caches
+@main.route('/api/cache_stats')
+def api_cache_stats():
+    if 'role' not in session or session['role'] != 'Administrator':
+        return jsonify({"error": "Access denied"}), 403
+    return jsonify(cache_stats())
+
+# Bulk onboarding: a CSV roster of students, teachers or parents uploaded as multipart "file" with a "kind" field
+@main.route('/api/import_roster', methods=['POST'])
+def api_import_roster():
+    if 'role' not in session or session['role'] != 'Administrator':
+        return jsonify({"error": "Access denied"}), 403
+
+    kind = request.form.get('kind')
+    upload = request.files.get('file')
+    if kind not in REQUIRED_COLUMNS:
+        return jsonify({"error": f"kind must be one of {', '.join(REQUIRED_COLUMNS)}"}), 400
+    if not upload:
+        return jsonify({"error": "Missing CSV file"}), 400
+    try:
+        csv_text = upload.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return jsonify({"error": "CSV file must be UTF-8"}), 400
+
+    try:
+        report = import_roster(kind, csv_text)
+    except PyMongoError as e:
+        return jsonify({"error": f"Import failed: {e}"}), 500
+    return jsonify(report)
+
+# Filters accepted by the audit log page and API, each backed by an index ending in _id
+AUDIT_LOG_FILTERS = ("admin_user", "username", "updated_item")
+AUDIT_LOG_PAGE_SIZE = 50
+
+# Builds the audit_log query from request arguments. Entries are paged by _id (newest first);
+# ObjectIds encode their creation time, so the date range is also applied to _id.
+def audit_log_query(args):
+    query = {field: args[field] for field in AUDIT_LOG_FILTERS if args.get(field)}
+    id_range = {}
+    start_date = parse_date(args.get("start_date"))
+    end_date = parse_date(args.get("end_date"))
+    if start_date:
+        id_range["$gte"] = ObjectId.from_datetime(start_date)
+    if end_date:
+        id_range["$lt"] = ObjectId.from_datetime(end_date + timedelta(days=1)) # End date is inclusive
+    if args.get("before") and ObjectId.is_valid(args["before"]):
+        before = ObjectId(args["before"])
+        id_range["$lt"] = min(before, id_range["$lt"]) if "$lt" in id_range else before
+    if id_range:
+        query["_id"] = id_range
+    return query
+
+# Returns one page of audit log entries and the cursor for the next page (None on the last page)
+def get_audit_log_page(args):
+    try:
+        limit = min(max(int(args.get("limit", AUDIT_LOG_PAGE_SIZE)), 1), 500)
+    except ValueError:
+        limit = AUDIT_LOG_PAGE_SIZE
+    entries = list(mongo.db.audit_log.find(audit_log_query(args)).sort("_id", -1).limit(limit + 1))
+    next_cursor = str(entries[limit - 1]["_id"]) if len(entries) > limit else None
+    return entries[:limit], next_cursor
+
 # Audit Log page for updated items
 @main.route('/audit_log')
 def audit_log():
@@ -632,8 +849,19 @@ def audit_log():
         flash("Access denied.", "error")
         return redirect(url_for('auth.home'))
 
-    audit_logs = list(mongo.db.audit_log.find({})) # Lists values retained in the audit_log collection
-    return render_template('admin/audit_log.html', audit_logs=audit_logs)
+    # Renders the newest page; the page loads further entries from /api/audit_log
+    audit_logs, next_cursor = get_audit_log_page(request.args)
+    return render_template('admin/audit_log.html', audit_logs=audit_logs, next_cursor=next_cursor, filters=request.args)
+
+@main.route('/api/audit_log', methods=['GET'])
+def api_audit_log():
+    if 'role' not in session or session['role'] != 'Administrator':
+        return jsonify({"error": "Access denied"}), 403
+
+    entries, next_cursor = get_audit_log_page(request.args)
+    for entry in entries:
+        entry["_id"] = str(entry["_id"])
+    return jsonify({"audit_logs": entries, "next_cursor": next_cursor})
 
 # Parent Access Pages
 # Parent Dashboard
@@ -653,6 +881,7 @@ def parent_attendance_records():
 
 
 @main.route('/api/parent_students', methods=['GET'])
+@conditional(max_age=300)
 def api_parent_students():
     # Ensure the user logged in is a Parent
     parent_id = session.get('username')
@@ -683,6 +912,13 @@ def api_parent_students():
     return jsonify({"students": student_list})
 
 
+# Returns {student_id: [attendance records from the last 30 days]} for the given students
+def get_recent_attendance(student_ids, days=30):
+    records = {student_id: [] for student_id in student_ids}
+    for record in find_attendance(today() - timedelta(days=days), student_ids=student_ids):
+        records[record.pop("student_id")].append(record)
+    return records
+
 @main.route('/api/attendance_records', methods=['GET'])
 def api_attendance_records():
     # Get the student_id from the request parameters
@@ -690,17 +926,8 @@ def api_attendance_records():
     if not student_id:
         return jsonify({"error": "Missing student_id"}), 400
 
-    # Calculate the date 30 days ago (assumes Attendance.date is stored as 'YYYY-MM-DD')
-    cutoff_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-
-    # Query the Attendance collection for records of the specified student that are within the last 30 days
-    records = list(mongo.db.Attendance.find(
-        {
-            "student_id": student_id,
-            "date": {"$gte": cutoff_date}
-        },
-        {"class_id": 1, "date": 1, "status": 1, "_id": 0}
-    ))
+    # Records of the specified student within the last 30 days
+    records = get_recent_attendance([student_id])[student_id]
 
     return jsonify({"records": records})
 
@@ -713,6 +940,7 @@ def parent_bus_schedule():
 
 
 @main.route('/api/parent_students_bus', methods=['GET'])
+@conditional(max_age=300)
 def api_parent_students_bus():
     # Ensure the parent is logged in
     parent_id = session.get('username')
@@ -744,6 +972,7 @@ def api_parent_students_bus():
 
 
 @main.route('/api/parent_bus_schedule', methods=['GET'])
+@conditional(max_age=300)
 def api_parent_bus_schedule():
     # Get the student_id from query parameters
     student_id = request.args.get('student_id')
@@ -778,43 +1007,15 @@ def parent_view_class_schedule():
 
 
 @main.route('/api/parent_class_schedule', methods=['GET'])
+@conditional(max_age=300)
 def api_parent_class_schedule():
     # Retrieves linked students
     student_id = request.args.get('student_id')
     if not student_id:
         return jsonify({"error": "Missing student_id"}), 400
 
-    # Query Teacher Profile collection for teachers whose assigned_classes include the student_id
-    teacher_profiles = list(mongo.db["Teacher Profile"].find(
-        {"assigned_classes.students_enrolled": student_id},
-        {"teacher_id": 1, "name": 1, "email": 1, "phone": 1, "assigned_classes": 1, "_id": 0}
-    ))
-
-    # Query the Student Profile collection to get enrolled_classes for the student
-    student = mongo.db["Student Profile"].find_one(
-        {"student_id": student_id},
-        {"enrolled_classes": 1, "_id": 0}
-    )
-    enrolled_classes = student.get("enrolled_classes", []) if student else []
-    # Build a mapping from class_id to schedule from the student's enrolled_classes
-    schedule_mapping = {cls.get("class_id"): cls.get("schedule", "N/A") for cls in enrolled_classes}
-
-    schedule = []
-    for teacher in teacher_profiles:
-        for cls in teacher.get("assigned_classes", []):
-            # Only include the class if the student is enrolled in it
-            if student_id in cls.get("students_enrolled", []):
-                class_id = cls.get("class_id", "")
-                # Ensure the class_id from the teacher's record matches one in the student's enrolled_classes
-                class_schedule = schedule_mapping.get(class_id, "N/A")
-                schedule.append({
-                    "teacher_name": teacher.get("name", ""),
-                    "class_number": class_id,
-                    "class_name": cls.get("subject", ""),
-                    "email": teacher.get("email", ""),
-                    "phone": teacher.get("phone", ""),
-                    "schedule": class_schedule
-                })
+    # Classes taught to the student, joined with the student's schedule for each class
+    schedule = get_class_schedule(student_id)
     return jsonify({"schedule": schedule})
 
 # View linked students grades
@@ -856,48 +1057,134 @@ def api_parent_students_gradeassignments():
     return jsonify({"students": student_list})
 
 
+# Returns {student_id: [assignments assigned in the last 30 days]} for the given students
+def get_recent_grades(student_ids, days=30):
+    cutoff_date = today() - timedelta(days=days)
+    grades = {student_id: [] for student_id in student_ids}
+
+    # Get the students' assignments in the window from assignments_grades collection
+    assignments = mongo.db["assignments_grades"].find(
+        {"student_id": {"$in": list(student_ids)}, **date_since("assigned_date", cutoff_date)},
+        {"student_id": 1, "class_number": 1, "assignment_name": 1, "assigned_date": 1, "due_date": 1, "grade": 1, "_id": 0}
+    )
+
+    for assignment in assignments:
+        dt_assigned = parse_date(assignment.get('assigned_date'))
+        dt_due = parse_date(assignment.get('due_date'))
+        if not dt_assigned or not dt_due:
+            logger.warning("Could not parse dates for assignment", extra={
+                "student_id": assignment.get("student_id"), "assignment_name": assignment.get("assignment_name")})
+            continue
+
+        # Re-checks rows still stored as MM/DD/YYYY strings, which the query cannot range-compare
+        if dt_assigned >= cutoff_date:
+            # Reformat both dates to MM/DD/YYYY
+            assignment['assigned_date'] = format_date(dt_assigned)
+            assignment['due_date'] = format_date(dt_due)
+            grades[assignment.pop('student_id')].append(assignment)
+    return grades
+
 @main.route('/api/parent_grades', methods=['GET'])
 def api_parent_grades():
     student_id = request.args.get('student_id')
     if not student_id:
         return jsonify({"error": "Missing student_id"}), 400
 
-    # Calculate cutoff date: assignments assigned within the last 30 days
-    cutoff_date = (datetime.now() - timedelta(days=30)).date()
+    # Assignments assigned within the last 30 days
+    filtered_assignments = get_recent_grades([student_id])[student_id]
 
-    # Get all assignments for the student from assignments_grades collection
-    assignments = list(mongo.db["assignments_grades"].find(
-        {"student_id": student_id},
-        {"class_number": 1, "assignment_name": 1, "assigned_date": 1, "due_date": 1, "grade": 1, "_id": 0}
-    ))
+    return jsonify({"assignments": filtered_assignments})
 
-    filtered_assignments = []
-    for assignment in assignments:
-        # Parse assigned_date with fallback
-        try:
-            dt_assigned = datetime.strptime(assignment['assigned_date'], "%m/%d/%Y")
-        except ValueError:
-            try:
-                dt_assigned = datetime.strptime(assignment['assigned_date'], "%Y-%m-%d")
-            except Exception as e:
-                print("Error parsing assigned_date for assignment:", assignment, "Error:", e)
-                continue
-
-        # Parse due_date with fallback
-        try:
-            dt_due = datetime.strptime(assignment['due_date'], "%m/%d/%Y")
-        except ValueError:
-            try:
-                dt_due = datetime.strptime(assignment['due_date'], "%Y-%m-%d")
-            except Exception as e:
-                print("Error parsing due_date for assignment:", assignment, "Error:", e)
-                continue
-
-        # Compare only the date parts
-        if dt_assigned.date() >= cutoff_date:
-            # Reformat both dates to MM/DD/YYYY
-            assignment['assigned_date'] = dt_assigned.strftime("%m/%d/%Y")
-            assignment['due_date'] = dt_due.strftime("%m/%d/%Y")
-            filtered_assignments.append(assignment)
 
-    return jsonify({"assignments": filtered_assignments})
\ No newline at end of file
+# Everything the parent pages show for every linked student in one request. The Parent Profile is read
+# once, then grades, attendance, profiles and schedules are fetched for all children with concurrent $in queries.
+@main.route('/api/parent_overview', methods=['GET'])
+def api_parent_overview():
+    parent_id = session.get('username')
+    if not parent_id:
+        return jsonify({"error": "User not logged in"}), 401
+
+    parent_profile = mongo.db["Parent Profile"].find_one({"parent_id": parent_id}, {"linked_students.student_id": 1, "_id": 0})
+    if not parent_profile:
+        return jsonify({"error": "Parent profile not found"}), 404
+
+    student_ids = [student.get("student_id") for student in parent_profile.get("linked_students", [])]
+    if not student_ids:
+        return jsonify({"students": []})
+
+    profiles, grades, attendance, schedules = run_concurrently(
+        lambda: list(mongo.db["Student Profile"].find(
+            {"student_id": {"$in": student_ids}},
+            {"student_id": 1, "first_name": 1, "last_name": 1, "bus_schedule": 1, "_id": 0}
+        )),
+        lambda: get_recent_grades(student_ids),
+        lambda: get_recent_attendance(student_ids),
+        lambda: get_class_schedules(student_ids)
+    )
+
+    students = []
+    for s in profiles:
+        student_id = s["student_id"]
+        bus_schedule = s.get("bus_schedule") or {}
+        if bus_schedule and "stop_name" not in bus_schedule:
+            bus_schedule["stop_name"] = "N/A"
+        students.append({
+            "id": student_id,
+            "name": f"{s.get('first_name', '')} {s.get('last_name', '')}".strip(),
+            "grades": grades[student_id],
+            "attendance": attendance[student_id],
+            "bus_schedule": bus_schedule,
+            "schedule": schedules[student_id]
+        })
+
+    return jsonify({"students": students})
+
+
+# Whether the logged-in user may see a student's data: the student themselves, their parents,
+# teachers of a class they are enrolled in, and administrators
+def can_view_student(student_id):
+    role = session.get('role')
+    username = session.get('username')
+    if role == 'Administrator':
+        return True
+    if role == 'Student':
+        return username == student_id
+    if role == 'Teacher':
+        return any(student_id in cls.get("students_enrolled", []) for cls in get_teacher_classes(username) or [])
+    if role == 'Parent':
+        return mongo.db["Parent Profile"].find_one(
+            {"parent_id": username, "linked_students.student_id": student_id}, {"_id": 1}
+        ) is not None
+    return False
+
+# Whether the logged-in user may see a class's data: its teachers and administrators
+def can_view_class(class_id):
+    role = session.get('role')
+    if role == 'Administrator':
+        return True
+    if role == 'Teacher':
+        return any(cls["class_id"] == class_id for cls in get_teacher_classes(session.get('username')) or [])
+    return False
+
+# Attendance and grade summaries read from the incrementally maintained rollups (one document each)
+@main.route('/api/rollups/student/<student_id>', methods=['GET'])
+def api_student_rollup(student_id):
+    if not session.get('username'):
+        return jsonify({"error": "User not logged in"}), 401
+    if not can_view_student(student_id):
+        return jsonify({"error": "Access denied"}), 403
+    summary = rollups.summary(rollups.STUDENT_ROLLUPS, student_id)
+    if not summary:
+        return jsonify({"error": "No summary for student"}), 404
+    return jsonify(summary)
+
+@main.route('/api/rollups/class/<class_id>', methods=['GET'])
+def api_class_rollup(class_id):
+    if not session.get('username'):
+        return jsonify({"error": "User not logged in"}), 401
+    if not can_view_class(class_id):
+        return jsonify({"error": "Access denied"}), 403
+    summary = rollups.summary(rollups.CLASS_ROLLUPS, class_id)
+    if not summary:
+        return jsonify({"error": "No summary for class"}), 404
+    return jsonify(summary)
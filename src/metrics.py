@@ -0,0 +1,124 @@
+import hmac
+import os
+import time
+from flask import Response, current_app, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               generate_latest, multiprocess)
+from pymongo import monitoring
+
+# Under a pre-fork server set PROMETHEUS_MULTIPROC_DIR (before the app is imported) to a directory shared by
+# the workers; each worker then writes its samples there and /metrics aggregates them across processes.
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUESTS = Counter("http_requests_total", "Requests handled, by route and status.", ["method", "endpoint", "status"])
+LATENCY = Histogram("http_request_duration_seconds", "Time to produce a response, by route.",
+                    ["method", "endpoint"], buckets=LATENCY_BUCKETS)
+SIZE = Histogram("http_response_size_bytes", "Response body size as sent (after compression), by route.",
+                 ["method", "endpoint"], buckets=SIZE_BUCKETS)
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled.", multiprocess_mode="livesum")
+
+MONGO_CONNECTIONS = Gauge("mongo_pool_connections", "Open MongoDB connections, by server.",
+                          ["address"], multiprocess_mode="livesum")
+MONGO_CHECKED_OUT = Gauge("mongo_pool_checked_out", "MongoDB connections in use by a request, by server.",
+                          ["address"], multiprocess_mode="livesum")
+MONGO_CHECKOUT_FAILURES = Counter("mongo_pool_checkout_failures_total", "Failed connection checkouts, by server and reason.",
+                                  ["address", "reason"])
+MONGO_POOL_CLEARED = Counter("mongo_pool_cleared_total", "Times a connection pool was cleared, by server.", ["address"])
+
+def address(event):
+    return "%s:%s" % event.address
+
+class PoolListener(monitoring.ConnectionPoolListener):
+    # Connection pool events update the gauges; events not worth a metric are ignored
+    def connection_created(self, event):
+        MONGO_CONNECTIONS.labels(address(event)).inc()
+
+    def connection_closed(self, event):
+        MONGO_CONNECTIONS.labels(address(event)).dec()
+
+    def connection_checked_out(self, event):
+        MONGO_CHECKED_OUT.labels(address(event)).inc()
+
+    def connection_checked_in(self, event):
+        MONGO_CHECKED_OUT.labels(address(event)).dec()
+
+    def connection_check_out_failed(self, event):
+        MONGO_CHECKOUT_FAILURES.labels(address(event), str(event.reason)).inc()
+
+    def pool_cleared(self, event):
+        MONGO_POOL_CLEARED.labels(address(event)).inc()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+# Passed to MongoClient alongside the query listener
+pool_listener = PoolListener()
+
+def endpoint_label():
+    # Unmatched URLs share one label so 404 scans cannot create unbounded series
+    return request.endpoint or "unmatched"
+
+def metrics_view():
+    # Scrapers must send METRICS_TOKEN as a bearer token; only debug and testing serve metrics without one
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        if not (current_app.debug or current_app.testing):
+            return Response("Not Found", status=404)
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return Response("Unauthorized", status=401)
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+def init_app(app):
+    app.config.setdefault('METRICS_TOKEN', os.getenv('METRICS_TOKEN'))
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_recorded = False
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_response(response):
+        if "metrics_start" not in g:
+            return response
+        labels = (request.method, endpoint_label())
+        REQUESTS.labels(*labels, str(response.status_code)).inc()
+        LATENCY.labels(*labels).observe(time.perf_counter() - g.metrics_start)
+        # Streamed responses have no length until they are sent
+        if response.content_length is not None:
+            SIZE.labels(*labels).observe(response.content_length)
+        g.metrics_recorded = True
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if "metrics_start" not in g:
+            return
+        IN_FLIGHT.dec()
+        # Unhandled exceptions skip after_request
+        if not g.metrics_recorded:
+            labels = (request.method, endpoint_label())
+            REQUESTS.labels(*labels, "500").inc()
+            LATENCY.labels(*labels).observe(time.perf_counter() - g.metrics_start)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
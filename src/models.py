@@ -1,23 +1,33 @@
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 from src import mongo
+from src.passwords import hash_password
+from src.search import shadow_fields
+
+# Fields read when listing users; the password hash is left out unless a caller asks for it
+LIST_FIELDS = ("username", "email", "role", "name")
 
 class User:
     # User model to handle CRUD operations for the 'users' collection in MongoDB.
-    
-    def __init__(self, username, email, password, role):
+    # Stored with __slots__ so listing thousands of users does not allocate a __dict__ per record.
+    __slots__ = ("username", "email", "password", "role", "name")
+
+    def __init__(self, username, email, *, password_hash, role, name=None):
+        # Builds a user from stored values; password_hash must already be hashed and is keyword-only,
+        # so a plain-text password cannot be stored by position. Use User.create for a new user.
         self.username = username
         self.email = email
-        self.password = generate_password_hash(password)  # Hash password before storing
+        self.password = password_hash
         self.role = role
+        self.name = name
+
+    @classmethod
+    def create(cls, username, email, password, role, name=None):
+        # Create a new user, hashing the plain-text password with the configured parameters before storing.
+        return cls(username, email, password_hash=hash_password(password), role=role, name=name)
 
     def save(self):
         # Save the user to the database.
-        mongo.db.users.insert_one({
-            "username": self.username,
-            "email": self.email,
-            "password": self.password,
-            "role": self.role
-        })
+        mongo.db.users.insert_one(self.to_dict())
 
     @staticmethod
     def find_by_username(username):
@@ -29,30 +39,38 @@ class User:
 
     @staticmethod
     def from_dict(data):
-        # Create a User instance from a dictionary.
+        # Create a User instance from a dictionary. The stored password is already hashed and is not re-hashed.
         return User(
-            username=data['username'],
-            email=data['email'],
-            password=data['password'],  # Password is already hashed
-            role=data['role']
+            username=data.get('username'),
+            email=data.get('email'),
+            password_hash=data.get('password'),
+            role=data.get('role'),
+            name=data.get('name')
         )
 
     def verify_password(self, password):
         # Check if the provided password matches the stored password.
+        if not self.password:
+            return False
         return check_password_hash(self.password, password)
 
     @staticmethod
-    def find_all():
-        # Retrieve all users.
-        users = mongo.db.users.find()
-        return [User.from_dict(user) for user in users]
+    def find_all(page=None, page_size=100, fields=LIST_FIELDS):
+        # Lazily yield users sorted by username, projected to fields (pass None for whole documents).
+        # With page set, yields only that zero-based page of page_size users.
+        projection = {field: 1 for field in fields} if fields else None
+        users = mongo.db.users.find({}, projection).sort("username", 1).batch_size(page_size)
+        if page is not None:
+            users = users.skip(page * page_size).limit(page_size)
+        for user in users:
+            yield User.from_dict(user)
 
     @staticmethod
     def update_user(username, update_data):
         # Update a user's information.
         mongo.db.users.update_one(
             {"username": username},
-            {"$set": update_data}
+            {"$set": {**update_data, **shadow_fields(update_data)}}
         )
 
     @staticmethod
@@ -62,9 +80,13 @@ class User:
 
     def to_dict(self):
         # Convert the User instance to a dictionary.
-        return {
+        data = {
             "username": self.username,
             "email": self.email,
             "password": self.password,  # This remains hashed
             "role": self.role
-        }
\ No newline at end of file
+        }
+        if self.name is not None:
+            data["name"] = self.name
+        data.update(shadow_fields(data))  # Lowercase copies used by user search
+        return data
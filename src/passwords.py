@@ -0,0 +1,88 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import partial
+from flask import current_app
+from src.concurrency import gevent_patched
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class LoginBusy(Exception):
+    """Raised when password verification is saturated; the login should be retried shortly."""
+
+# Bounded pool for password verification. hashlib's scrypt and pbkdf2 release the GIL, so threads
+# verify in parallel, while the pool size caps how many cores sign-in surges can occupy at once.
+_pool = None
+# Admission control: verifications running plus waiting; logins beyond this are turned away immediately
+_slots = None
+
+# PASSWORD_HASH_METHOD -> stored hash prefix (e.g. "scrypt" -> "scrypt:32768:8:1"), computed once per method
+_prefixes = {}
+
+def hash_function():
+    """generate_password_hash bound to the configured parameters; picklable for process pools."""
+    return partial(
+        generate_password_hash,
+        method=current_app.config['PASSWORD_HASH_METHOD'],
+        salt_length=current_app.config['PASSWORD_SALT_LENGTH']
+    )
+
+def hash_password(password):
+    return hash_function()(password)
+
+def needs_rehash(stored_hash):
+    """Return True if stored_hash was made with parameters other than the configured ones."""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if method not in _prefixes:
+        _prefixes[method] = generate_password_hash("", method=method, salt_length=1).split("$", 1)[0]
+    return stored_hash.split("$", 1)[0] != _prefixes[method]
+
+def _run(function, *args):
+    # Runs function on the pool under admission control, raising LoginBusy when it is saturated or too slow
+    if not _slots.acquire(blocking=False):
+        raise LoginBusy()
+    try:
+        future = _pool.submit(function, *args)
+    except RuntimeError:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=current_app.config['LOGIN_HASH_TIMEOUT'])
+    except FutureTimeout:
+        raise LoginBusy()
+
+def verify_password(stored_hash, password):
+    """Check password against stored_hash on the verification pool.
+
+    Raises LoginBusy when the pool and its queue are full or the check does not finish in time.
+    """
+    if not stored_hash or not password:
+        return False
+    return _run(check_password_hash, stored_hash, password)
+
+def rehash_password(password):
+    """Hash password with the configured parameters on the verification pool, for upgrading at login.
+
+    Raises LoginBusy like verify_password; callers can skip the upgrade until the next login.
+    """
+    return _run(hash_function(), password)
+
+def init_app(app):
+    global _pool, _slots
+    # Hash parameters for new and upgraded passwords; existing hashes are upgraded when their owner logs in
+    app.config.setdefault('PASSWORD_HASH_METHOD', os.getenv('PASSWORD_HASH_METHOD', 'scrypt'))
+    app.config.setdefault('PASSWORD_SALT_LENGTH', int(os.getenv('PASSWORD_SALT_LENGTH', 16)))
+    # Verification pool size, extra logins allowed to wait, and how long one may wait (seconds)
+    app.config.setdefault('LOGIN_HASH_WORKERS', int(os.getenv('LOGIN_HASH_WORKERS', os.cpu_count() or 1)))
+    app.config.setdefault('LOGIN_QUEUE_LIMIT', int(os.getenv('LOGIN_QUEUE_LIMIT', app.config['LOGIN_HASH_WORKERS'] * 4)))
+    app.config.setdefault('LOGIN_HASH_TIMEOUT', float(os.getenv('LOGIN_HASH_TIMEOUT', 5)))
+
+    workers = app.config['LOGIN_HASH_WORKERS']
+    if gevent_patched():
+        # Under gevent workers threading makes greenlets, which would run hashes on the event loop and
+        # stall every other request; gevent's own executor runs them on real OS threads
+        from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+        _pool = GeventThreadPoolExecutor(max_workers=workers)
+    else:
+        _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='login-hash')
+    _slots = threading.BoundedSemaphore(workers + app.config['LOGIN_QUEUE_LIMIT'])
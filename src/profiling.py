@@ -0,0 +1,164 @@
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from flask import Blueprint, current_app, flash, g, jsonify, redirect, render_template, request, send_from_directory, session, url_for
+from src.concurrency import gevent_patched
+
+profiling = Blueprint('profiling', __name__)
+
+# Suffixes written per profiled request: cProfile statistics, collapsed stacks for flame graphs, and metadata
+PSTATS = ".pstats"
+COLLAPSED = ".collapsed"
+META = ".json"
+
+class StackSampler:
+    """Samples one thread's stack every interval seconds and counts collapsed stacks ("outer;...;inner")."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+def stack_sampling():
+    # The sampler finds a request's stack by OS thread id. Under gevent workers a request is a greenlet
+    # whose id sys._current_frames() never reports, and the sampler greenlet would only run when the
+    # request yields, so requests are profiled with cProfile alone.
+    return not gevent_patched()
+
+def should_profile(app):
+    # An administrator asking for it with the header, or a random sample of all requests
+    if request.headers.get(app.config['PROFILE_HEADER']) and session.get('role') == 'Administrator':
+        return True
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+def write_profile(app, profiler, sampler, duration, status):
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    started = datetime.now()
+    name = f"{started:%Y%m%d-%H%M%S-%f}-{request.endpoint or 'unmatched'}"
+
+    profiler.dump_stats(os.path.join(directory, name + PSTATS))
+    if sampler is not None:
+        with open(os.path.join(directory, name + COLLAPSED), "w") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+    with open(os.path.join(directory, name + META), "w") as f:
+        json.dump({"name": name, "method": request.method, "path": request.path, "endpoint": request.endpoint,
+                   "status": status, "duration_ms": round(duration * 1000, 1),
+                   "captured": started.isoformat(timespec="seconds"), "samples": sum(sampler.stacks.values()) if sampler is not None else None}, f)
+
+    # Keep only the newest PROFILE_KEEP profiles
+    metas = sorted(entry for entry in os.listdir(directory) if entry.endswith(META))
+    for old in metas[:-app.config['PROFILE_KEEP']]:
+        for suffix in (PSTATS, COLLAPSED, META):
+            try:
+                os.remove(os.path.join(directory, old[:-len(META)] + suffix))
+            except FileNotFoundError:
+                pass
+
+def list_profiles(directory):
+    profiles = []
+    if os.path.isdir(directory):
+        for entry in sorted(os.listdir(directory), reverse=True):
+            if entry.endswith(META):
+                with open(os.path.join(directory, entry)) as f:
+                    profiles.append(json.load(f))
+    return profiles
+
+@profiling.route('/admin/profiles')
+def profiles_page():
+    if 'role' not in session or session['role'] != 'Administrator':
+        flash("Access denied.", "error")
+        return redirect(url_for('auth.home'))
+    return render_template(
+        'admin/profiles.html',
+        profiles=list_profiles(current_app.config['PROFILE_DIR']),
+        enabled=current_app.config['PROFILING_ENABLED'],
+        header=current_app.config['PROFILE_HEADER'],
+        sample_rate=current_app.config['PROFILE_SAMPLE_RATE'],
+        stack_sampling=stack_sampling()
+    )
+
+@profiling.route('/admin/profiles/<name>')
+def download_profile(name):
+    if 'role' not in session or session['role'] != 'Administrator':
+        return jsonify({"error": "Access denied"}), 403
+    if not name.endswith((PSTATS, COLLAPSED)):
+        return jsonify({"error": "Profile not found"}), 404
+    return send_from_directory(current_app.config['PROFILE_DIR'], name, as_attachment=True)
+
+def init_app(app):
+    # Profiling is off unless PROFILING_ENABLED is true; when off no request hooks are installed at all.
+    # When on, an administrator's request carrying PROFILE_HEADER, or PROFILE_SAMPLE_RATE of all requests,
+    # runs under cProfile plus a stack sampler taking a sample every PROFILE_INTERVAL seconds.
+    app.config.setdefault('PROFILING_ENABLED', os.getenv('PROFILING_ENABLED', 'false').lower() == 'true')
+    app.config.setdefault('PROFILE_DIR', os.getenv('PROFILE_DIR', os.path.join(app.instance_path, 'profiles')))
+    app.config.setdefault('PROFILE_HEADER', os.getenv('PROFILE_HEADER', 'X-Profile'))
+    app.config.setdefault('PROFILE_SAMPLE_RATE', float(os.getenv('PROFILE_SAMPLE_RATE', 0)))
+    app.config.setdefault('PROFILE_INTERVAL', float(os.getenv('PROFILE_INTERVAL', 0.005)))
+    app.config.setdefault('PROFILE_KEEP', int(os.getenv('PROFILE_KEEP', 200)))
+
+    if not app.config['PROFILING_ENABLED']:
+        return
+
+    @app.before_request
+    def start_profile():
+        if not should_profile(app):
+            return
+        g.profile_sampler = None
+        if stack_sampling():
+            g.profile_sampler = StackSampler(threading.get_ident(), app.config['PROFILE_INTERVAL'])
+            g.profile_sampler.start()
+        g.profiler = cProfile.Profile()
+        g.profile_start = time.perf_counter()
+        g.profiler.enable()
+
+    @app.after_request
+    def finish_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        duration = time.perf_counter() - g.profile_start
+        sampler = g.pop('profile_sampler')
+        if sampler is not None:
+            sampler.stop()
+        write_profile(app, profiler, sampler, duration, response.status_code)
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        # A request that raised skips after_request; stop profiling without writing a partial profile
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            sampler = g.pop('profile_sampler')
+            if sampler is not None:
+                sampler.stop()
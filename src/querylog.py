@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from flask import g, request
+from pymongo import monitoring
+from src import mongo
+
+logger = logging.getLogger(__name__)
+
+# Connection housekeeping and our own explain calls are not attributed to requests
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "buildinfo", "buildInfo", "saslStart",
+                    "saslContinue", "endSessions", "explain", "killCursors"}
+# Commands that can be explained to look for collection scans
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Cursor continuations belong to the query that opened the cursor and do not count against budgets
+CONTINUATIONS = {"getMore"}
+
+class QueryBudgetError(AssertionError):
+    """Raised in enforcement mode when a request issues more commands than its budget or repeats one in a loop."""
+
+class RequestLog:
+    # Commands issued while handling one request, possibly from several threads (see run_concurrently)
+    def __init__(self, keep_commands=False):
+        self.commands = []
+        self.pending = {}
+        self.keep_commands = keep_commands
+        self.lock = threading.Lock()
+
+# Log of the request being handled; copied into run_concurrently threads with the rest of the context
+_current = ContextVar("querylog", default=None)
+
+def shape(value):
+    """The structure of a filter with its values blanked out, so queries differing only by value compare equal."""
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shape(item) for item in value[:1]]
+    return "?"
+
+def command_filter(name, command):
+    if name == "find":
+        return command.get("filter", {})
+    if name == "aggregate":
+        return next((stage["$match"] for stage in command.get("pipeline", []) if "$match" in stage), {})
+    if name in ("findAndModify", "count", "distinct"):
+        return command.get("query", {})
+    if name in ("update", "delete"):
+        statements = command.get(name + "s") or [{}]
+        return statements[0].get("q", {})
+    return {}
+
+def documents(name, reply):
+    if "cursor" in reply:
+        cursor = reply["cursor"]
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    return reply.get("n", 0)
+
+class QueryListener(monitoring.CommandListener):
+    def started(self, event):
+        log = _current.get()
+        if log is None or event.command_name in IGNORED_COMMANDS:
+            return
+        name = event.command_name
+        command = event.command
+        collection = command.get("collection") if name in CONTINUATIONS else command.get(name)
+        record = {
+            "command": name,
+            "collection": collection if isinstance(collection, str) else None,
+            "shape": json.dumps(shape(command_filter(name, command)), sort_keys=True, default=str),
+        }
+        if log.keep_commands and name in EXPLAINABLE:
+            record["source"] = {key: value for key, value in command.items()
+                                if not key.startswith("$") and key not in ("lsid", "txnNumber")}
+            record["database"] = event.database_name
+        log.pending[(event.connection_id, event.request_id)] = record
+
+    def _finish(self, event, **fields):
+        log = _current.get()
+        if log is None:
+            return
+        record = log.pending.pop((event.connection_id, event.request_id), None)
+        if record is None:
+            return
+        record["duration_ms"] = event.duration_micros / 1000
+        record.update(fields)
+        with log.lock:
+            log.commands.append(record)
+
+    def succeeded(self, event):
+        self._finish(event, docs=documents(event.command_name, event.reply))
+
+    def failed(self, event):
+        self._finish(event, docs=0, error=str(event.failure.get("errmsg", event.failure)))
+
+# Passed to MongoClient through mongo.init_app(app, event_listeners=[listener])
+listener = QueryListener()
+
+def winning_plan_scans(explain):
+    # True if any winning plan in an explain result contains a collection scan
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan" and "COLLSCAN" in json.dumps(value, default=str):
+                return True
+            if key != "rejectedPlans" and winning_plan_scans(value):
+                return True
+    elif isinstance(explain, list):
+        return any(winning_plan_scans(item) for item in explain)
+    return False
+
+def flag_collscans(commands):
+    """Explain each distinct query of the request once and mark those planned as collection scans."""
+    plans = {}
+    for record in commands:
+        source = record.pop("source", None)
+        if source is None:
+            continue
+        key = (record["command"], record["collection"], record["shape"])
+        if key not in plans:
+            try:
+                explain = mongo.cx[record.pop("database")].command({"explain": source, "verbosity": "queryPlanner"})
+                plans[key] = winning_plan_scans(explain)
+            except Exception:
+                plans[key] = None
+        record["collscan"] = plans[key]
+
+def repeated(commands, threshold):
+    """Single-document commands repeated with the same shape at least threshold times (likely a loop)."""
+    counts = Counter((r["command"], r["collection"], r["shape"]) for r in commands
+                     if r["command"] not in CONTINUATIONS and r.get("docs", 0) <= 1)
+    return [{"command": c, "collection": coll, "shape": s, "count": n}
+            for (c, coll, s), n in counts.items() if n >= threshold]
+
+def summarize(commands, threshold):
+    counted = [r for r in commands if r["command"] not in CONTINUATIONS]
+    by_operation = Counter(f"{r['collection']}.{r['command']}" for r in commands)
+    return {
+        "commands": len(counted),
+        "continuations": len(commands) - len(counted),
+        "duration_ms": round(sum(r["duration_ms"] for r in commands), 2),
+        "docs": sum(r.get("docs", 0) for r in commands),
+        "operations": dict(by_operation),
+        "collscans": sorted({f"{r['collection']}.{r['command']} {r['shape']}" for r in commands if r.get("collscan")}),
+        "errors": [r["error"] for r in commands if "error" in r],
+        "repeated": repeated(commands, threshold),
+    }
+
+def query_budget(limit, per_item=None):
+    """Declare the most MongoDB commands a route may issue (cursor continuations excluded).
+
+    per_item names a list in the JSON body of a batch route that deliberately issues one command per item:
+    each item raises the limit by one, and the route is exempt from the repeated-command check.
+    Checked only when enforcement is on (QUERY_ENFORCE or app.testing).
+    """
+    def decorator(view):
+        view.query_budget = limit
+        view.query_budget_per_item = per_item
+        return view
+    return decorator
+
+def enforcing(app):
+    return app.config['QUERY_ENFORCE'] or app.testing
+
+def init_app(app):
+    # QUERY_ACCOUNTING logs a command summary per request; QUERY_ENFORCE (always on under app.testing)
+    # fails requests that exceed their @query_budget or QUERY_BUDGET_DEFAULT or repeat a single-document
+    # command QUERY_REPEAT_THRESHOLD times. QUERY_EXPLAIN explains each query to flag collection scans.
+    app.config.setdefault('QUERY_ACCOUNTING', os.getenv('QUERY_ACCOUNTING', 'false').lower() == 'true')
+    app.config.setdefault('QUERY_ENFORCE', os.getenv('QUERY_ENFORCE', 'false').lower() == 'true')
+    app.config.setdefault('QUERY_EXPLAIN', os.getenv('QUERY_EXPLAIN', 'false').lower() == 'true')
+    app.config.setdefault('QUERY_BUDGET_DEFAULT', int(os.getenv('QUERY_BUDGET_DEFAULT', 0)))
+    app.config.setdefault('QUERY_REPEAT_THRESHOLD', int(os.getenv('QUERY_REPEAT_THRESHOLD', 5)))
+
+    @app.before_request
+    def start_request_log():
+        if app.config['QUERY_ACCOUNTING'] or enforcing(app):
+            g.querylog_token = _current.set(RequestLog(keep_commands=app.config['QUERY_EXPLAIN']))
+
+    @app.after_request
+    def check_request_log(response):
+        log = _current.get()
+        if log is None or not enforcing(app):
+            return response
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, "query_budget", None) or app.config['QUERY_BUDGET_DEFAULT']
+        per_item = getattr(view, "query_budget_per_item", None)
+        if budget and per_item:
+            body = request.get_json(silent=True)
+            items = body.get(per_item) if isinstance(body, dict) else None
+            budget += len(items) if isinstance(items, list) else 0
+        summary = summarize(log.commands, app.config['QUERY_REPEAT_THRESHOLD'])
+        if budget and summary["commands"] > budget:
+            raise QueryBudgetError(f"{request.endpoint} issued {summary['commands']} MongoDB commands, budget is {budget}: {summary['operations']}")
+        if summary["repeated"] and not per_item:
+            raise QueryBudgetError(f"{request.endpoint} repeated single-document commands: {summary['repeated']}")
+        return response
+
+    @app.teardown_request
+    def log_request_summary(exc):
+        log = _current.get()
+        if log is None:
+            return
+        _current.reset(g.querylog_token)
+        if not log.commands:
+            return
+        if app.config['QUERY_EXPLAIN']:
+            flag_collscans(log.commands)
+        summary = summarize(log.commands, app.config['QUERY_REPEAT_THRESHOLD'])
+        logger.info("Request queries", extra={"method": request.method, "path": request.path,
+                                              "endpoint": request.endpoint, **summary})
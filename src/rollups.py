@@ -0,0 +1,195 @@
+import click
+from collections import defaultdict
+from flask import current_app
+from pymongo import ReplaceOne, UpdateOne
+from src import mongo
+from src.bulk import chunked
+
+# Per-student and per-class counters kept up to date by the attendance, grade and homework write paths,
+# so summaries are a single document read. Rebuild with 'flask rebuild-rollups' and verify with 'flask check-rollups'.
+STUDENT_ROLLUPS = "student_rollups"
+CLASS_ROLLUPS = "class_rollups"
+
+# Attendance status -> counter field
+STATUS_FIELDS = {"Present": "present", "Late": "late", "Absent": "absent"}
+ATTENDANCE_FIELDS = tuple(STATUS_FIELDS.values())
+GRADE_FIELDS = ("assignments", "graded", "graded_numeric", "grade_sum")
+
+def numeric_grade(grade):
+    """Return grade as a float, or None for letter grades and blanks."""
+    try:
+        return float(grade)
+    except (TypeError, ValueError):
+        return None
+
+def is_graded(grade):
+    return grade not in (None, "")
+
+def _apply(student_deltas, class_deltas):
+    # One bulk $inc upsert per rollup collection
+    for collection_name, deltas in ((STUDENT_ROLLUPS, student_deltas), (CLASS_ROLLUPS, class_deltas)):
+        operations = [
+            UpdateOne({"_id": key}, {"$inc": inc}, upsert=True)
+            for key, inc in deltas.items() if any(inc.values())
+        ]
+        if operations:
+            mongo.db[collection_name].bulk_write(operations, ordered=False)
+
+def apply_attendance(class_id, previous, statuses):
+    """Update counters for statuses written to class_id, given the statuses they replaced."""
+    student_deltas = defaultdict(lambda: defaultdict(int))
+    class_deltas = defaultdict(lambda: defaultdict(int))
+    for student_id, status in statuses.items():
+        old = previous.get(student_id)
+        if old == status:
+            continue
+        for value, step in ((old, -1), (status, 1)):
+            field = STATUS_FIELDS.get(value)
+            if field:
+                student_deltas[student_id][field] += step
+                class_deltas[class_id][field] += step
+    _apply(student_deltas, class_deltas)
+
+def apply_grades(changes):
+    """Update counters for (student_id, class_id, old_grade, new_grade) changes."""
+    student_deltas = defaultdict(lambda: defaultdict(int))
+    class_deltas = defaultdict(lambda: defaultdict(int))
+    for student_id, class_id, old, new in changes:
+        for value, step in ((old, -1), (new, 1)):
+            if not is_graded(value):
+                continue
+            number = numeric_grade(value)
+            for deltas, key in ((student_deltas, student_id), (class_deltas, class_id)):
+                deltas[key]["graded"] += step
+                if number is not None:
+                    deltas[key]["graded_numeric"] += step
+                    deltas[key]["grade_sum"] += step * number
+    _apply(student_deltas, class_deltas)
+
+def apply_assignments(rows):
+    """Count newly inserted assignments_grades rows."""
+    student_deltas = defaultdict(lambda: defaultdict(int))
+    class_deltas = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        student_deltas[row["student_id"]]["assignments"] += 1
+        class_deltas[row["class_number"]]["assignments"] += 1
+    _apply(student_deltas, class_deltas)
+
+def summary(collection_name, key):
+    """Return the rollup document with attendance_rate and grade_average, or None."""
+    doc = mongo.db[collection_name].find_one({"_id": key})
+    if not doc:
+        return None
+    attended = doc.get("present", 0) + doc.get("late", 0)
+    total = attended + doc.get("absent", 0)
+    doc["attendance_rate"] = round(attended / total, 4) if total else None
+    doc["grade_average"] = round(doc["grade_sum"] / doc["graded_numeric"], 2) if doc.get("graded_numeric") else None
+    return doc
+
+# Aggregation pipelines recomputing the counters from raw data, grouped by student or class
+def _attendance_pipeline(key_field, match=None):
+    status_counts = {field: {"$sum": {"$cond": [{"$eq": ["$status", status]}, 1, 0]}} for status, field in STATUS_FIELDS.items()}
+    if current_app.config.get('ATTENDANCE_LAYOUT') == "bucketed":
+        # Buckets hold a records array; flat documents remain the source of truth in the flat and dual layouts
+        return "attendance_buckets", [
+            {"$unwind": "$records"},
+            {"$project": {"class_id": 1, "student_id": "$records.student_id", "status": "$records.status"}},
+            *([{"$match": match}] if match else []),
+            {"$group": {"_id": f"${key_field}", **status_counts}},
+        ]
+    return "Attendance", [
+        *([{"$match": match}] if match else []),
+        {"$group": {"_id": f"${key_field}", **status_counts}},
+    ]
+
+def _grade_pipeline(key_field, match=None):
+    graded = {"$and": [{"$ne": [{"$ifNull": ["$grade", None]}, None]}, {"$ne": ["$grade", ""]}]}
+    number = {"$convert": {"input": "$grade", "to": "double", "onError": None, "onNull": None}}
+    return "assignments_grades", [
+        *([{"$match": match}] if match else []),
+        {"$project": {key_field: 1, "graded": graded, "number": number}},
+        {"$group": {
+            "_id": f"${key_field}",
+            "assignments": {"$sum": 1},
+            "graded": {"$sum": {"$cond": ["$graded", 1, 0]}},
+            "graded_numeric": {"$sum": {"$cond": [{"$ne": ["$number", None]}, 1, 0]}},
+            "grade_sum": {"$sum": {"$ifNull": ["$number", 0]}},
+        }},
+    ]
+
+# Rollup collection -> (attendance key, grade key)
+ROLLUP_KEYS = {STUDENT_ROLLUPS: ("student_id", "student_id"), CLASS_ROLLUPS: ("class_id", "class_number")}
+
+def compute(collection_name, keys=None, batch_size=1000):
+    """Yield freshly computed rollup documents for collection_name, limited to keys when given."""
+    attendance_key, grade_key = ROLLUP_KEYS[collection_name]
+    docs = defaultdict(dict)
+    for pipeline_builder, key_field in ((_attendance_pipeline, attendance_key), (_grade_pipeline, grade_key)):
+        match = {key_field: {"$in": list(keys)}} if keys is not None else None
+        source, pipeline = pipeline_builder(key_field, match)
+        for group in mongo.db[source].aggregate(pipeline, allowDiskUse=True, batchSize=batch_size):
+            key = group.pop("_id")
+            if key is not None:
+                docs[key].update(group)
+    for key, values in docs.items():
+        yield {"_id": key, **{field: 0 for field in ATTENDANCE_FIELDS + GRADE_FIELDS}, **values}
+
+def rebuild(batch_size=1000, echo=print):
+    """Recompute every rollup from raw data.
+
+    Documents are replaced in place batch by batch, so summaries stay readable throughout. A live $inc
+    that lands between a batch's aggregate and its replace is overwritten and lost, so pause writes
+    (attendance, grades, homework) during a rebuild, or run check-rollups afterwards and rebuild again
+    if it reports drift. Only documents that existed before the run and were not recomputed are deleted.
+    """
+    for collection_name in ROLLUP_KEYS:
+        stale = {doc["_id"] for doc in mongo.db[collection_name].find({}, {"_id": 1}).batch_size(batch_size)}
+        written = 0
+        for batch in chunked(compute(collection_name, batch_size=batch_size), batch_size):
+            mongo.db[collection_name].bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch], ordered=False
+            )
+            stale.difference_update(doc["_id"] for doc in batch)
+            written += len(batch)
+            echo(f"{collection_name}: {written} written")
+        for keys in chunked(stale, batch_size):
+            mongo.db[collection_name].delete_many({"_id": {"$in": keys}})
+        echo(f"{collection_name}: {len(stale)} stale removed")
+
+def check(batch_size=1000, echo=print):
+    """Compare stored rollups with values recomputed from raw data; return the mismatched keys."""
+    mismatched = []
+    for collection_name in ROLLUP_KEYS:
+        fields = ATTENDANCE_FIELDS + GRADE_FIELDS
+        stored_ids = mongo.db[collection_name].find({}, {"_id": 1}).batch_size(batch_size)
+        for ids in chunked((doc["_id"] for doc in stored_ids), batch_size):
+            expected = {doc["_id"]: doc for doc in compute(collection_name, keys=ids, batch_size=batch_size)}
+            for stored in mongo.db[collection_name].find({"_id": {"$in": ids}}):
+                fresh = expected.get(stored["_id"], {})
+                diffs = {f: (stored.get(f, 0), fresh.get(f, 0)) for f in fields
+                         if abs(stored.get(f, 0) - fresh.get(f, 0)) > 1e-6}
+                if diffs:
+                    mismatched.append((collection_name, stored["_id"]))
+                    echo(f"{collection_name} {stored['_id']}: " + ", ".join(f"{f} stored {a} expected {b}" for f, (a, b) in diffs.items()))
+        # Raw data with no rollup document at all
+        stored_keys = set(mongo.db[collection_name].distinct("_id"))
+        for doc in compute(collection_name, batch_size=batch_size):
+            if doc["_id"] not in stored_keys:
+                mismatched.append((collection_name, doc["_id"]))
+                echo(f"{collection_name} {doc['_id']}: missing")
+    echo(f"{len(mismatched)} mismatched rollups")
+    return mismatched
+
+def init_app(app):
+    @app.cli.command('rebuild-rollups')
+    @click.option('--batch-size', default=1000, show_default=True, help="Rollup documents written per batch.")
+    def rebuild_rollups_command(batch_size):
+        """Recompute attendance and grade rollups from raw data (pause writes while it runs)."""
+        rebuild(batch_size=batch_size, echo=click.echo)
+
+    @app.cli.command('check-rollups')
+    @click.option('--batch-size', default=1000, show_default=True, help="Rollup documents compared per batch.")
+    def check_rollups_command(batch_size):
+        """Report rollups that differ from the raw attendance and grade data."""
+        if check(batch_size=batch_size, echo=click.echo):
+            raise SystemExit(1)
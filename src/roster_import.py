@@ -0,0 +1,156 @@
+import csv
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import click
+from src import mongo
+from src.bulk import insert_many_chunked, chunked
+from src.cache import invalidate_student, invalidate_teacher
+from src.models import User
+from src.passwords import hash_function
+
+# Columns each roster kind must provide; parents may also list linked_students separated by ';'
+REQUIRED_COLUMNS = {
+    "students": ("username", "email", "password", "first_name", "last_name"),
+    "teachers": ("username", "email", "password", "name"),
+    "parents": ("username", "email", "password", "name"),
+}
+ROLES = {"students": "Student", "teachers": "Teacher", "parents": "Parent"}
+
+# Rows checked against existing usernames per query
+LOOKUP_CHUNK_SIZE = 1000
+
+def build_profile(kind, row):
+    # Profile document created alongside each imported user
+    if kind == "students":
+        return "Student Profile", {
+            "student_id": row["username"],
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "email": row["email"],
+            "enrolled_classes": [],
+        }
+    if kind == "teachers":
+        return "Teacher Profile", {
+            "teacher_id": row["username"],
+            "name": row["name"],
+            "email": row["email"],
+            "phone": row.get("phone", ""),
+            "assigned_classes": [],
+        }
+    linked = [student_id.strip() for student_id in (row.get("linked_students") or "").split(";") if student_id.strip()]
+    return "Parent Profile", {
+        "parent_id": row["username"],
+        "name": row["name"],
+        "email": row["email"],
+        "linked_students": [{"student_id": student_id} for student_id in linked],
+    }
+
+def validate_rows(kind, rows):
+    """Return (valid rows as (line, row), errors as {"line", "error"}), deduplicating in memory."""
+    required = REQUIRED_COLUMNS[kind]
+    valid = []
+    errors = []
+    seen = set()
+    # Line 1 is the header
+    for line, row in enumerate(rows, start=2):
+        row = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        missing = [column for column in required if not row.get(column)]
+        if missing:
+            errors.append({"line": line, "error": f"Missing {', '.join(missing)}"})
+        elif row["username"].lower() in seen:
+            errors.append({"line": line, "error": f"Duplicate username {row['username']} in file"})
+        else:
+            seen.add(row["username"].lower())
+            valid.append((line, row))
+
+    # Usernames that already exist in any letter case, checked with one $in query per chunk on the lowercase
+    # shadow field (and on username itself for users created before the shadow fields were backfilled)
+    existing = set()
+    for chunk in chunked([row["username"].lower() for _, row in valid], LOOKUP_CHUNK_SIZE):
+        existing.update(user["username"].lower() for user in mongo.db.users.find(
+            {"$or": [{"username_lower": {"$in": chunk}}, {"username": {"$in": chunk}}]}, {"username": 1, "_id": 0}
+        ))
+    if existing:
+        errors.extend({"line": line, "error": f"Username {row['username']} already exists"}
+                      for line, row in valid if row["username"].lower() in existing)
+        valid = [(line, row) for line, row in valid if row["username"].lower() not in existing]
+    return valid, errors
+
+def hash_passwords(passwords, workers=None):
+    """Hash passwords across a process pool; each hash is deliberately slow, so this is CPU bound.
+
+    The pool spawns fresh interpreters rather than forking: a web worker already runs threads (query pool,
+    pymongo monitors, log listener) whose locks a forked child could inherit held, and may be monkey-patched.
+    """
+    workers = workers or int(os.getenv('IMPORT_HASH_WORKERS', os.cpu_count() or 1))
+    hash_one = hash_function()
+    if workers <= 1 or len(passwords) < 2:
+        return [hash_one(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(hash_one, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+def import_roster(kind, csv_text, workers=None):
+    """Import a CSV roster of students, teachers or parents into users and the matching profile collection.
+
+    Returns a report with counts, per-row errors and throughput.
+    """
+    if kind not in REQUIRED_COLUMNS:
+        raise ValueError(f"kind must be one of {', '.join(REQUIRED_COLUMNS)}")
+    started = time.perf_counter()
+
+    valid, errors = validate_rows(kind, csv.DictReader(io.StringIO(csv_text)))
+
+    hash_started = time.perf_counter()
+    hashes = hash_passwords([row["password"] for _, row in valid], workers=workers)
+    hash_seconds = time.perf_counter() - hash_started
+
+    users = [
+        User(row["username"], row["email"], password_hash=password_hash, role=ROLES[kind],
+             name=row.get("name") or f"{row.get('first_name', '')} {row.get('last_name', '')}".strip()).to_dict()
+        for (_, row), password_hash in zip(valid, hashes)
+    ]
+
+    # Profiles are written only for users that were actually inserted, so a lost race leaves no orphan profile
+    inserted_usernames = set()
+    user_result = insert_many_chunked(
+        mongo.db.users, users,
+        on_inserted=lambda docs: inserted_usernames.update(doc["username"] for doc in docs)
+    )
+    profiles = [build_profile(kind, row) for _, row in valid if row["username"] in inserted_usernames]
+    profile_result = {"inserted": 0, "duplicates": 0}
+    if profiles:
+        profile_result = insert_many_chunked(mongo.db[profiles[0][0]], [profile for _, profile in profiles])
+
+    # New names and rosters must not be served from a stale cache entry
+    invalidate = {"students": invalidate_student, "teachers": invalidate_teacher}.get(kind)
+    if invalidate:
+        for username in inserted_usernames:
+            invalidate(username)
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": len(valid) + len(errors),
+        "users_inserted": user_result["inserted"],
+        "profiles_inserted": profile_result["inserted"],
+        "duplicates": user_result["duplicates"] + profile_result["duplicates"],
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "hash_seconds": round(hash_seconds, 3),
+        "rows_per_second": round(len(valid) / seconds, 1) if seconds else None,
+    }
+
+def init_app(app):
+    @app.cli.command('import-roster')
+    @click.argument('kind', type=click.Choice(list(REQUIRED_COLUMNS)))
+    @click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+    @click.option('--workers', default=None, type=int, help="Password hashing processes (default: CPU count).")
+    def import_roster_command(kind, csv_file, workers):
+        """Create users and profiles from a CSV roster."""
+        report = import_roster(kind, csv_file.read(), workers=workers)
+        for error in report.pop("errors"):
+            click.echo(f"line {error['line']}: {error['error']}")
+        for key, value in report.items():
+            click.echo(f"{key}: {value}")
@@ -0,0 +1,76 @@
+import re
+import click
+from pymongo import UpdateOne
+from src import mongo
+
+# Lowercase copies of searchable user fields. Anchored, case-sensitive prefix regexes on these can use
+# an index, unlike case-insensitive or unanchored regexes on the originals.
+SHADOW_FIELDS = {"username": "username_lower", "email": "email_lower"}
+
+# Fields returned by user searches
+RESULT_FIELDS = {"username": 1, "email": 1, "name": 1, "role": 1, "_id": 0}
+
+MAX_LIMIT = 100
+
+def shadow_fields(data):
+    """Return the lowercase shadow values for any searchable fields present in data."""
+    return {shadow: data[field].lower() for field, shadow in SHADOW_FIELDS.items() if isinstance(data.get(field), str)}
+
+def search_users(query, page=0, limit=20, fuzzy=False):
+    """Return (users, has_more) for users whose username or email starts with query.
+
+    Matching is case-insensitive through the shadow fields. With fuzzy set, or when the prefix
+    search finds nothing on the first page, the users text index is searched for whole words instead.
+    """
+    query = (query or "").strip()
+    if not query:
+        return [], False
+    limit = min(max(limit, 1), MAX_LIMIT)
+    skip = max(page, 0) * limit
+
+    if not fuzzy:
+        prefix = {"$regex": "^" + re.escape(query.lower())}
+        cursor = mongo.db.users.find(
+            {"$or": [{shadow: prefix} for shadow in SHADOW_FIELDS.values()]},
+            RESULT_FIELDS
+        ).sort("username_lower", 1).skip(skip).limit(limit + 1)
+        users = list(cursor)
+        if users or page > 0:
+            return users[:limit], len(users) > limit
+
+    cursor = mongo.db.users.find(
+        {"$text": {"$search": query}},
+        {**RESULT_FIELDS, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).skip(skip).limit(limit + 1)
+    users = list(cursor)
+    for user in users:
+        user.pop("score", None)
+    return users[:limit], len(users) > limit
+
+def backfill_shadow_fields(batch_size=1000, echo=print):
+    """Set the shadow fields on users that are missing them or have stale values."""
+    updated = 0
+    last_id = None
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        batch = list(mongo.db.users.find(query, {"username": 1, "email": 1, **{s: 1 for s in SHADOW_FIELDS.values()}})
+                     .sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        ops = []
+        for user in batch:
+            values = shadow_fields(user)
+            if any(user.get(shadow) != value for shadow, value in values.items()):
+                ops.append(UpdateOne({"_id": user["_id"]}, {"$set": values}))
+        if ops:
+            updated += mongo.db.users.bulk_write(ops, ordered=False).modified_count
+        echo(f"users: {updated} updated")
+    return updated
+
+def init_app(app):
+    @app.cli.command('backfill-user-search')
+    @click.option('--batch-size', default=1000, show_default=True, help="Users updated per bulk write.")
+    def backfill_user_search_command(batch_size):
+        """Populate the lowercase search fields on existing users."""
+        backfill_shadow_fields(batch_size=batch_size, echo=click.echo)
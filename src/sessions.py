@@ -0,0 +1,151 @@
+import copy
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+from src import mongo
+
+# Session stores selectable with SESSION_STORE: mongo for deployments, memory for tests and local runs
+STORES = ("mongo", "memory")
+SESSIONS = "sessions"
+
+def new_sid():
+    return secrets.token_urlsafe(32)
+
+def now():
+    return datetime.now(timezone.utc)
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session data held on the server; the cookie only carries sid.
+
+    Loaded at most once per request and kept on the request context, so every session
+    access within a request reads this object rather than the store.
+    """
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        # Move the data to a fresh id, so an id planted before login cannot be used afterwards
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = new_sid()
+        self.modified = True
+
+class MongoSessionStore:
+    # One document per session; the session_expiry TTL index removes expired ones
+    def load(self, sid):
+        doc = mongo.db[SESSIONS].find_one({"_id": sid, "expires_at": {"$gt": now()}})
+        return (doc["data"], doc["expires_at"].replace(tzinfo=timezone.utc)) if doc else None
+
+    def save(self, sid, data, expires_at):
+        mongo.db[SESSIONS].replace_one({"_id": sid}, {"data": data, "expires_at": expires_at}, upsert=True)
+
+    def touch(self, sid, expires_at):
+        mongo.db[SESSIONS].update_one({"_id": sid}, {"$set": {"expires_at": expires_at}})
+
+    def delete(self, sid):
+        mongo.db[SESSIONS].delete_one({"_id": sid})
+
+class MemorySessionStore:
+    # Per-process store; sessions are not shared between workers and are lost on restart
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None or entry[1] <= now():
+                self._sessions.pop(sid, None)
+                return None
+            return copy.deepcopy(entry[0]), entry[1]
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._sessions[sid] = (copy.deepcopy(data), expires_at)
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            if sid in self._sessions:
+                self._sessions[sid] = (self._sessions[sid][0], expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        # Static files never use the session, so they do not cost a store lookup
+        if request.path.startswith(app.static_url_path + "/"):
+            return ServerSession()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            loaded = self.store.load(sid)
+            if loaded is not None:
+                data, expires_at = loaded
+                return ServerSession(data, sid=sid, expires_at=expires_at)
+        return ServerSession(sid=new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        if session.sid is None:
+            return
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+
+        # Cleared (logged out) or never used: drop the stored session and the cookie
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        response.vary.add("Cookie")
+        lifetime = app.permanent_session_lifetime
+        expires_at = now() + lifetime
+        if session.modified:
+            self.store.save(session.sid, dict(session), expires_at)
+        elif session.expires_at and session.expires_at - now() < lifetime / 2:
+            # Sliding expiry, written at most once per half lifetime instead of on every request
+            self.store.touch(session.sid, expires_at)
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+            domain=domain,
+            path=path,
+        )
+
+def init_app(app):
+    # Where sessions are kept and how long an idle session lasts (seconds)
+    app.config.setdefault('SESSION_STORE', os.getenv('SESSION_STORE', 'mongo'))
+    # Flask always provides a 31-day PERMANENT_SESSION_LIFETIME, so ours only replaces that default,
+    # never a lifetime the app configured itself
+    if app.config['PERMANENT_SESSION_LIFETIME'] == app.default_config['PERMANENT_SESSION_LIFETIME']:
+        app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(seconds=int(os.getenv('SESSION_LIFETIME', 12 * 60 * 60)))
+    if app.config['SESSION_STORE'] not in STORES:
+        raise ValueError(f"SESSION_STORE must be one of {', '.join(STORES)}")
+
+    store = MongoSessionStore() if app.config['SESSION_STORE'] == 'mongo' else MemorySessionStore()
+    app.session_interface = ServerSessionInterface(store)
@@ -0,0 +1,107 @@
+# Query budget enforcement (src/querylog.py) under app.testing.
+# Run from the repository root: python -m pytest -q
+#
+# The driver's command events are replayed through the real listener, so these tests need no database.
+# Set MONGO_TEST_URI to also run the budget check against a live MongoDB through pymongo.
+
+import itertools
+import os
+from types import SimpleNamespace
+import pytest
+from flask import Flask, jsonify, request
+from src import querylog
+from src.querylog import QueryBudgetError, query_budget
+
+_ids = itertools.count(1)
+
+def run_command(name, collection, command_filter, docs=1):
+    """Report one command to the listener as pymongo would: a started event, then a succeeded one."""
+    request_id = next(_ids)
+    command = {name: collection, "filter": command_filter}
+    querylog.listener.started(SimpleNamespace(command_name=name, command=command, database_name="SMS",
+                                              connection_id=("localhost", 27017), request_id=request_id))
+    reply = {"cursor": {"firstBatch": [{}] * docs}} if name == "find" else {"n": docs}
+    querylog.listener.succeeded(SimpleNamespace(command_name=name, reply=reply, duration_micros=250,
+                                                connection_id=("localhost", 27017), request_id=request_id))
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.testing = True
+    querylog.init_app(app)
+
+    @app.route('/profiles')
+    @query_budget(10)
+    def profiles():
+        # One lookup per student: the N+1 loop the repeat check exists to catch, even within budget
+        for student_id in range(6):
+            run_command("find", "Student Profile", {"student_id": student_id})
+        return jsonify({})
+
+    @app.route('/roster')
+    @query_budget(2)
+    def roster():
+        run_command("find", "Teacher Profile", {"teacher_id": "t1"})
+        run_command("find", "Student Profile", {"student_id": {"$in": ["s1", "s2"]}}, docs=2)
+        return jsonify({})
+
+    @app.route('/roster_and_grades')
+    @query_budget(2)
+    def roster_and_grades():
+        run_command("find", "Teacher Profile", {"teacher_id": "t1"})
+        run_command("find", "Student Profile", {"student_id": {"$in": ["s1", "s2"]}}, docs=2)
+        run_command("find", "assignments_grades", {"student_id": {"$in": ["s1", "s2"]}}, docs=10)
+        return jsonify({})
+
+    @app.route('/grades', methods=['POST'])
+    @query_budget(1, per_item="grades")
+    def grades():
+        # One write per item is declared, so it is neither over budget nor a repeated loop
+        run_command("find", "Teacher Profile", {"teacher_id": "t1"})
+        for grade in request.json["grades"]:
+            run_command("findAndModify", "assignments_grades", {"student_id": grade["student_id"]})
+        return jsonify({})
+
+    return app
+
+def test_repeated_query_loop_fails(app):
+    with pytest.raises(QueryBudgetError, match="repeated single-document commands"):
+        app.test_client().get('/profiles')
+
+def test_over_budget_fails(app):
+    with pytest.raises(QueryBudgetError, match="issued 3 MongoDB commands, budget is 2"):
+        app.test_client().get('/roster_and_grades')
+
+def test_within_budget_passes(app):
+    assert app.test_client().get('/roster').status_code == 200
+
+def test_per_item_budget_passes(app):
+    grades = [{"student_id": f"s{n}"} for n in range(6)]
+    assert app.test_client().post('/grades', json={"grades": grades}).status_code == 200
+
+def test_not_enforced_outside_testing(app):
+    app.testing = False
+    assert app.test_client().get('/profiles').status_code == 200
+
+@pytest.mark.skipif(not os.getenv('MONGO_TEST_URI'), reason="MONGO_TEST_URI not set")
+def test_repeated_query_loop_fails_against_mongodb():
+    from pymongo import MongoClient
+    client = MongoClient(os.environ['MONGO_TEST_URI'], event_listeners=[querylog.listener])
+    collection = client.get_default_database("sms_test")["Student Profile"]
+
+    app = Flask(__name__)
+    app.testing = True
+    querylog.init_app(app)
+
+    @app.route('/profiles')
+    @query_budget(10)
+    def profiles():
+        for student_id in range(6):
+            collection.find_one({"student_id": student_id})
+        return jsonify({})
+
+    try:
+        with pytest.raises(QueryBudgetError, match="repeated single-document commands"):
+            app.test_client().get('/profiles')
+    finally:
+        client.close()
@@ -0,0 +1,6 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# run.py starts Flask's development server and is for local use only.
+
+from src import create_app
+
+app = create_app()